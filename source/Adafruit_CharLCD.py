@@ -95,6 +95,19 @@ LCD_BACKPACK_D6         = 5
 LCD_BACKPACK_D7         = 6
 LCD_BACKPACK_LITE       = 7
 
+# Time the controller needs to execute a command, in microseconds (HD44780
+# datasheet table 6 at 270 kHz, with some margin).
+LCD_EXECUTION_US        = 41
+LCD_CLEAR_HOME_US       = 1640
+LCD_INIT_US             = 4100
+
+# Waits longer than this sleep and give the CPU away instead of spinning,
+# waking up this much early to make up for the sleep overshooting.
+LCD_YIELD_US            = 200
+LCD_SLEEP_SLACK_US      = 100
+
+_clock = getattr(time, 'monotonic', time.time)
+
 class Adafruit_CharLCD(object):
     """Class to represent and interact with an HD44780 character LCD display."""
 
@@ -147,6 +160,8 @@ class Adafruit_CharLCD(object):
         self._pwm_enabled = enable_pwm
         self._pwm = pwm
         self._blpol = not invert_polarity
+        # When the controller is done with the last command sent.
+        self._ready_at = 0
         # Setup all pins as outputs.
         for pin in (rs, en, d4, d5, d6, d7):
             gpio.setup(pin, GPIO.OUT)
@@ -157,9 +172,11 @@ class Adafruit_CharLCD(object):
             else:
                 gpio.setup(backlight, GPIO.OUT)
                 gpio.output(backlight, self._blpol if initial_backlight else not self._blpol)
-        # Initialize the display.
+        # Initialize the display, the controller may still be in 8 bit mode.
         self.write8(0x33)
+        self._busy_for(LCD_INIT_US)
         self.write8(0x32)
+        self._busy_for(LCD_INIT_US)
         # Initialize display control, function, and mode registers.
         self.displaycontrol = LCD_DISPLAYON | LCD_CURSOROFF | LCD_BLINKOFF
         self.displayfunction = LCD_4BITMODE | LCD_1LINE | LCD_2LINE | LCD_5x8DOTS
@@ -172,13 +189,11 @@ class Adafruit_CharLCD(object):
 
     def home(self):
         """Move the cursor back to its home (first line and first column)."""
-        self.write8(LCD_RETURNHOME)  # set cursor position to zero
-        self._delay_microseconds(3000)  # this command takes a long time!
+        self.write8(LCD_RETURNHOME)  # set cursor position to zero, the next write waits for it
 
     def clear(self):
         """Clear the LCD."""
-        self.write8(LCD_CLEARDISPLAY)  # command to clear display
-        self._delay_microseconds(3000)  # 3000 microsecond sleep, clearing the display takes a long time
+        self.write8(LCD_CLEARDISPLAY)  # command to clear display, the next write waits for it
 
     def set_cursor(self, col, row):
         """Move the cursor to an explicit column and row position."""
@@ -272,8 +287,8 @@ class Adafruit_CharLCD(object):
         value from 0-255, and char_mode is True if character data or False if
         non-character data (default).
         """
-        # One millisecond delay to prevent writing too quickly.
-        self._delay_microseconds(1000)
+        # Wait only until the controller has executed the previous command.
+        self._wait_ready()
         # Set character / data bit.
         self._gpio.output(self._rs, char_mode)
         # Write upper 4 bits.
@@ -288,6 +303,7 @@ class Adafruit_CharLCD(object):
                                  self._d6: ((value >> 2) & 1) > 0,
                                  self._d7: ((value >> 3) & 1) > 0 })
         self._pulse_enable()
+        self._busy_for(self._execution_time(value, char_mode))
 
     def create_char(self, location, pattern):
         """Fill one of the first 8 CGRAM locations with custom characters.
@@ -302,10 +318,30 @@ class Adafruit_CharLCD(object):
         for i in range(8):
             self.write8(pattern[i], char_mode=True)
 
+    def _execution_time(self, value, char_mode):
+        # Clear display and return home (0b0000001x) take much longer than anything else.
+        if not char_mode and LCD_CLEARDISPLAY <= value <= (LCD_RETURNHOME | 1):
+            return LCD_CLEAR_HOME_US
+        return LCD_EXECUTION_US
+
+    def _busy_for(self, microseconds):
+        # The controller cannot take another command for this long from now.
+        self._ready_at = max(self._ready_at, _clock() + microseconds/1000000.0)
+
+    def _wait_ready(self):
+        # Time spent elsewhere, e.g. on a slow I2C expander, counts towards the wait.
+        self._wait_until(self._ready_at)
+
     def _delay_microseconds(self, microseconds):
-        # Busy wait in loop because delays are generally very short (few microseconds).
-        end = time.time() + (microseconds/1000000.0)
-        while time.time() < end:
+        self._wait_until(_clock() + microseconds/1000000.0)
+
+    def _wait_until(self, end):
+        # Sleep through long waits, busy wait the rest because delays are generally
+        # very short (few microseconds).
+        left = end - _clock()
+        if left > LCD_YIELD_US/1000000.0:
+            time.sleep(left - LCD_SLEEP_SLACK_US/1000000.0)
+        while _clock() < end:
             pass
 
     def _pulse_enable(self):
@@ -23,7 +23,8 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 import itertools
-import time
+
+from . import timing
 
 
 # # # BIT PATTERNS # # #
@@ -96,13 +97,13 @@ class CursorMode(object):
 # # # HELPER FUNCTIONS # # #
 
 def msleep(milliseconds):
-    """Sleep the specified amount of milliseconds."""
-    time.sleep(milliseconds / 1000.0)
+    """Wait the specified amount of milliseconds, see ``timing.delay``."""
+    timing.delay(milliseconds / 1000.0)
 
 
 def usleep(microseconds):
-    """Sleep the specified amount of microseconds."""
-    time.sleep(microseconds / 1000000.0)
+    """Wait the specified amount of microseconds, see ``timing.delay``."""
+    timing.delay(microseconds / 1000000.0)
 
 
 def sliding_window(seq, lookahead):
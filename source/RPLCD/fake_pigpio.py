@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Stand-in for the ``pigpio`` module, enough of it to drive ``RPLCD.pigpio``
+without a Raspberry Pi or a pigpiod daemon.
+
+Every call on a ``pi`` costs ``ROUND_TRIP_US``, the time a request to a
+local pigpiod takes over its socket, and scripts and waves keep the fake
+daemon busy for as long as their delays add up to. The bytes the display
+would latch, from scripts and waves alike, are decoded into ``pi.received``
+as ``(rs, value)`` pairs, so both write paths can be checked against each
+other.
+
+``python -m RPLCD.fake_pigpio`` compares the per-byte script path with the
+batched wave path.
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import sys
+
+from . import timing
+
+
+OUTPUT = 1
+PI_SCRIPT_INITING = 0
+PI_SCRIPT_HALTED = 1
+PI_SCRIPT_RUNNING = 2
+PI_SCRIPT_NOT_READY = -62
+
+# Time a request to pigpiod on the same machine takes, in microseconds
+ROUND_TRIP_US = 60
+
+exceptions = True
+
+
+class error(Exception):
+    pass
+
+
+def error_text(code):
+    return 'pigpio error {}'.format(code)
+
+
+class pulse(object):
+
+    def __init__(self, gpio_on, gpio_off, delay):
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
+
+# Arguments of the script commands RPLCD.pigpio uses
+SCRIPT_ARITY = {'write': 2, 'mics': 1, 'trig': 3}
+
+
+class pi(object):
+
+    def __init__(self):
+        self.levels = {}
+        self.received = []
+        self.calls = 0
+        self._scripts = {}
+        self._waves = {}
+        self._pending = []
+        self._busy_until = 0
+        self._rs = None
+        self._e = None
+        self._lcd = None
+
+    def _call(self):
+        self.calls += 1
+        timing.udelay(ROUND_TRIP_US)
+
+    def _run_for(self, microseconds):
+        self._busy_until = timing.clock() + microseconds / 1000000.0
+
+    def _busy(self):
+        return timing.clock() < self._busy_until
+
+    def _set(self, gpio, level, rs_gpio, e_gpio):
+        falling = gpio == e_gpio and self.levels.get(gpio) and not level
+        self.levels[gpio] = level
+        if falling:
+            self._latch(rs_gpio)
+
+    def _latch(self, rs_gpio):
+        # the display takes the bus on the falling edge of E
+        self.received.append((self.levels.get(rs_gpio, 0), dict(self.levels)))
+
+    # Plain GPIO
+
+    def set_mode(self, gpio, mode):
+        self._call()
+
+    def write(self, gpio, level):
+        self._call()
+        self.levels[gpio] = level
+
+    def set_PWM_frequency(self, gpio, frequency):
+        self._call()
+
+    def set_PWM_dutycycle(self, gpio, dutycycle):
+        self._call()
+
+    def stop(self):
+        pass
+
+    # Scripts, only the commands RPLCD.pigpio stores
+
+    def store_script(self, text):
+        self._call()
+        tokens = text.decode('utf-8').split()
+        commands = []
+        while tokens:
+            name = tokens.pop(0)
+            arity = SCRIPT_ARITY[name]
+            commands.append((name, tokens[:arity]))
+            del tokens[:arity]
+        script_id = len(self._scripts)
+        self._scripts[script_id] = commands
+        return script_id
+
+    def run_script(self, script_id, params):
+        self._call()
+        if self._busy():
+            return PI_SCRIPT_NOT_READY
+        delay = 0
+        for name, args in self._scripts[script_id]:
+            args = [params[int(a[1:])] if a.startswith('p') else int(a) for a in args]
+            if name == 'write':
+                self.levels[args[0]] = args[1]
+            elif name == 'trig':
+                self.levels[args[0]] = args[2]
+                self._latch(self._rs)
+                self.levels[args[0]] = 1 - args[2]
+                delay += args[1]
+            elif name == 'mics':
+                delay += args[0]
+        self._run_for(delay)
+        return 0
+
+    def script_status(self, script_id):
+        self._call()
+        return (PI_SCRIPT_RUNNING if self._busy() else PI_SCRIPT_HALTED), []
+
+    def delete_script(self, script_id):
+        self._call()
+        del self._scripts[script_id]
+
+    # Waves
+
+    def wave_add_generic(self, pulses):
+        self._call()
+        self._pending.extend(pulses)
+        return len(self._pending)
+
+    def wave_create(self):
+        self._call()
+        wave_id = len(self._waves)
+        self._waves[wave_id], self._pending = self._pending, []
+        return wave_id
+
+    def wave_send_once(self, wave_id):
+        self._call()
+        delay = 0
+        for p in self._waves[wave_id]:
+            for gpio in range(32):
+                if p.gpio_on & (1 << gpio):
+                    self._set(gpio, 1, self._rs, self._e)
+                if p.gpio_off & (1 << gpio):
+                    self._set(gpio, 0, self._rs, self._e)
+            delay += p.delay
+        self._run_for(delay)
+        return len(self._waves[wave_id])
+
+    def wave_tx_busy(self):
+        self._call()
+        return 1 if self._busy() else 0
+
+    def wave_delete(self, wave_id):
+        self._call()
+        del self._waves[wave_id]
+
+    # Decoding
+
+    def attach(self, lcd):
+        """Decode what is written for ``lcd``, needs its pin numbers."""
+        self._rs = lcd.pins.rs
+        self._e = lcd.pins.e
+        self._lcd = lcd
+
+    def decoded(self):
+        """(rs, byte) the display received, nibbles joined in 4 bit mode."""
+        pins = self._lcd.pins
+        four_bit = pins.d0 is None
+        data_pins = [pins.d4, pins.d5, pins.d6, pins.d7] if four_bit else list(pins[4:12])
+        values = []
+        for rs, levels in self.received:
+            values.append((rs, sum(levels.get(pin, 0) << bit for bit, pin in enumerate(data_pins))))
+        if not four_bit:
+            return values
+        return [(rs, high << 4 | low) for (rs, high), (_, low) in zip(values[::2], values[1::2])]
+
+
+def benchmark(count=800, cols=40, rows=2):
+    """Print characters per second and pigpiod calls per character for the
+    per-byte script path and the batched wave path, on this stand-in."""
+    sys.modules.setdefault('pigpio', sys.modules[__name__])
+    from . import pigpio as backend
+
+    lines = ['0123456789' * 4, 'ABCDEFGHIJ' * 4]
+    results = {}
+    for batched in (False, True):
+        fake = pi()
+        lcd = backend.CharLCD(fake, pin_rs=7, pin_e=8, pins_data=[25, 24, 23, 18],
+                              cols=cols, rows=rows, batched=batched)
+        fake.attach(lcd)
+        fake.received = []
+        calls = fake.calls
+        written = 0
+        started = timing.clock()
+        while written < count:
+            lcd.cursor_pos = (0, 0)
+            lcd.write_string(lines[(written // cols) % 2][:cols])
+            written += cols
+        elapsed = timing.clock() - started
+        results[batched] = fake.decoded()
+        print('{}: {:.0f} chars/s, {:.2f} pigpiod calls per char'.format(
+            'batched waves' if batched else 'script per byte', written / elapsed,
+            (fake.calls - calls) / float(written)))
+    print('same bytes on the bus: {}'.format(results[False] == results[True]))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Stand-in for the ``smbus`` module with a PCF8574 backpack on the bus, enough
+of it to drive ``RPLCD.i2c`` without a Raspberry Pi.
+
+Every transaction costs ``TRANSACTION_US`` of kernel round trip plus the
+time its bytes take at ``BUS_HZ``. The PCF8574 latches each byte it is sent
+onto its pins, and the bytes the display takes on the falling edges of E are
+decoded into ``SMBus.received`` as ``(rs, value)`` pairs, so the per-byte and
+the batched write paths can be checked against each other. Instructions or
+data sent before the previous one had time to execute, counting the bytes in
+between at the fastest bus the PCF8574 runs at, are counted in
+``SMBus.too_soon``.
+
+``python -m RPLCD.fake_smbus`` compares the per-byte path with the batched
+block transfers.
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import sys
+
+from . import timing
+
+
+# Time an I2C transfer ioctl takes before any byte is on the bus, in microseconds
+TRANSACTION_US = 50
+# Default Raspberry Pi I2C clock
+BUS_HZ = 100000
+# Time one byte takes at 400 kHz, the PCF8574's fastest, in microseconds
+FAST_BYTE_US = 22.5
+
+# PCF8574 backpack pins
+RS = 0x01
+E = 0x04
+
+
+class i2c_msg(object):
+    """Only the write messages RPLCD.i2c sends."""
+
+    def __init__(self, addr, buf):
+        self.addr = addr
+        self.buf = list(buf)
+
+    @classmethod
+    def write(cls, address, buf):
+        return cls(address, buf)
+
+
+class SMBus(object):
+
+    def __init__(self, port=1):
+        self.port = port
+        self.transactions = 0
+        self.bytes = 0
+        self.received = []
+        self.too_soon = 0
+        self._pins = 0
+        self._nibble = None
+        # 0x03 and 0x02 are the reset sequence until a function set arrives
+        self._reset_done = False
+        # when the display is ready again: on the clock, or in microseconds
+        # into the current transaction
+        self._ready_at = 0
+        self._ready_after = None
+
+    def _transaction(self, data):
+        self.transactions += 1
+        self.bytes += len(data)
+        for position, value in enumerate(data):
+            self._output(value, position)
+        self._ready_after = None
+        timing.udelay(TRANSACTION_US + (len(data) + 1) * 9 * 1000000.0 / BUS_HZ)
+
+    def _output(self, value, position):
+        rising = value & E and not self._pins & E
+        falling = self._pins & E and not value & E
+        if rising and self._nibble is None:
+            if self._ready_after is not None:
+                early = position * FAST_BYTE_US < self._ready_after
+            else:
+                early = timing.clock() < self._ready_at
+            self.too_soon += early
+        self._pins = value
+        if falling:
+            self._latch(value, position)
+
+    def _latch(self, value, position):
+        # the display takes D7-D4 on the falling edge of E, high nibble first
+        if self._nibble is None:
+            self._nibble = value & 0xF0
+            return
+        rs = value & RS
+        byte = self._nibble | value >> 4
+        self._nibble = None
+        self.received.append((rs, byte))
+        if not rs and byte & 0xE0 == 0x20:
+            self._reset_done = True
+        clear_home = not rs and self._reset_done and byte in (1, 2, 3)
+        executes = timing.CLEAR_HOME_US if clear_home else timing.EXECUTION_US
+        self._ready_at = timing.clock() + executes / 1000000.0
+        self._ready_after = position * FAST_BYTE_US + executes
+
+    # The calls RPLCD.i2c makes
+
+    def write_byte(self, addr, val):
+        self._transaction([val])
+
+    def write_byte_data(self, addr, register, val):
+        self._transaction([register, val])
+
+    def write_i2c_block_data(self, addr, register, data):
+        if len(data) > 32:
+            raise ValueError('SMBus block writes take at most 32 bytes')
+        self._transaction([register] + list(data))
+
+    def i2c_rdwr(self, *msgs):
+        for msg in msgs:
+            self._transaction(msg.buf)
+
+    def close(self):
+        pass
+
+
+def benchmark(count=800, cols=40, rows=2):
+    """Print characters per second and I2C transactions per character for
+    the per-byte path and the batched one, on this stand-in."""
+    sys.modules.setdefault('smbus', sys.modules[__name__])
+    from . import common as c
+    from . import i2c as backend
+
+    class FakeBusLCD(backend.CharLCD):
+        def _init_connection(self):
+            self.bus = SMBus(self._port)
+            c.msleep(50)
+
+    lines = ['0123456789' * 4, 'ABCDEFGHIJ' * 4]
+    results = {}
+    for batched in (False, True):
+        lcd = FakeBusLCD('PCF8574', 0x27, cols=cols, rows=rows, batched=batched)
+        bus = lcd.bus
+        bus.received = []
+        transactions = bus.transactions
+        written = 0
+        started = timing.clock()
+        while written < count:
+            lcd.cursor_pos = (0, 0)
+            lcd.write_string(lines[(written // cols) % 2][:cols])
+            written += cols
+        elapsed = timing.clock() - started
+        results[batched] = bus.received
+        print('{}: {:.0f} chars/s, {:.2f} transactions per char, {} sent too soon'.format(
+            'batched blocks' if batched else 'byte per write', written / elapsed,
+            (bus.transactions - transactions) / float(written), bus.too_soon))
+    print('same bytes on the bus: {}'.format(results[False] == results[True]))
+
+
+if __name__ == '__main__':
+    benchmark()
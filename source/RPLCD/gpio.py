@@ -27,12 +27,38 @@ from collections import namedtuple
 import RPi.GPIO as GPIO
 
 from . import common as c
+from . import timing
 from .lcd import BaseCharLCD
 from .compat import range
 
 
 PinConfig = namedtuple('PinConfig', 'rs rw e d0 d1 d2 d3 d4 d5 d6 d7 backlight mode')
 
+# Give up on the busy flag if it stays set this long, in seconds
+BUSY_TIMEOUT = 0.01
+
+COMMAND_TYPES = [
+    (c.LCD_SETDDRAMADDR, 'set ddram address'),
+    (c.LCD_SETCGRAMADDR, 'set cgram address'),
+    (c.LCD_FUNCTIONSET, 'function set'),
+    (c.LCD_CURSORSHIFT, 'shift'),
+    (c.LCD_DISPLAYCONTROL, 'display control'),
+    (c.LCD_ENTRYMODESET, 'entry mode'),
+    (c.LCD_RETURNHOME, 'home'),
+    (c.LCD_CLEARDISPLAY, 'clear'),
+]
+
+
+def command_type(value, mode):
+    """Name of the kind of operation ``value`` is, as reported in
+    ``busy_latency``."""
+    if mode == c.RS_DATA:
+        return 'data'
+    for bit, name in COMMAND_TYPES:
+        if value & bit:
+            return name
+    return 'unknown'
+
 
 class CharLCD(BaseCharLCD):
     def __init__(self, numbering_mode=GPIO.BOARD, pin_rs=None, pin_rw=None, pin_e=None, pins_data=None,
@@ -40,7 +66,8 @@ class CharLCD(BaseCharLCD):
                        backlight_enabled=True,
                        cols=20, rows=4, dotsize=8,
                        charmap='A02',
-                       auto_linebreaks=True):
+                       auto_linebreaks=True,
+                       busy_flag=False):
         """
         Character LCD controller.
 
@@ -85,6 +112,12 @@ class CharLCD(BaseCharLCD):
         :param auto_linebreaks: Whether or not to automatically insert line
             breaks. Default: ``True``.
         :type auto_linebreaks: bool
+        :param busy_flag: Read the busy flag after every operation instead of
+            waiting the worst case time. Needs ``pin_rw``. While the flag is
+            read the display drives the data pins; a 5V display must be
+            connected through level shifters, since the Raspberry Pi pins
+            only take 3.3V. Default: ``False``.
+        :type busy_flag: bool
 
         """
         # Set attributes
@@ -99,6 +132,8 @@ class CharLCD(BaseCharLCD):
             raise ValueError('pin_rs is not defined.')
         if pin_e is None:
             raise ValueError('pin_e is not defined.')
+        if busy_flag and pin_rw is None:
+            raise ValueError('busy_flag needs pin_rw to be defined.')
 
         if len(pins_data) == 4:  # 4 bit mode
             self.data_bus_mode = c.LCD_4BITMODE
@@ -116,10 +151,22 @@ class CharLCD(BaseCharLCD):
                               mode=numbering_mode)
         self.backlight_mode = backlight_mode
 
+        # Wait after the first nibble of a byte in 4 bit mode. During the
+        # init sequence the controller may still be in 8 bit mode and
+        # execute it, afterwards it only needs the enable cycle time.
+        self._nibble_settle = timing.EXECUTION_US
+
+        # The busy flag can only be read once the init sequence is done
+        self._busy_polling = False
+        # command type -> [count, total seconds, max seconds] until not busy
+        self.busy_latency = {}
+
         # Call superclass
         super(CharLCD, self).__init__(cols, rows, dotsize,
                                       charmap=charmap,
                                       auto_linebreaks=auto_linebreaks)
+        self._nibble_settle = timing.ENABLE_PULSE_US
+        self._busy_polling = busy_flag
 
         # Set backlight status
         if pin_backlight is not None:
@@ -181,12 +228,17 @@ class CharLCD(BaseCharLCD):
         if self.pins.rw is not None:
             GPIO.output(self.pins.rw, 0)
 
-        # Write data out in chunks of 4 or 8 bit
+        # Write data out in chunks of 4 or 8 bit. When the busy flag is read
+        # there is no need to wait for the controller here.
+        settle = timing.ENABLE_PULSE_US if self._busy_polling else timing.EXECUTION_US
         if self.data_bus_mode == c.LCD_8BITMODE:
-            self._write8bits(value)
+            self._write8bits(value, settle)
         else:
-            self._write4bits(value >> 4)
-            self._write4bits(value)
+            self._write4bits(value >> 4, self._nibble_settle)
+            self._write4bits(value, settle)
+
+        if self._busy_polling:
+            self._wait_busy(command_type(value, mode))
 
     def _send_data(self, value):
         """Send data to the display. """
@@ -196,25 +248,79 @@ class CharLCD(BaseCharLCD):
         """Send instruction to the display. """
         self._send(value, c.RS_INSTRUCTION)
 
-    def _write4bits(self, value):
+    def _write4bits(self, value, settle=timing.EXECUTION_US):
         """Write 4 bits of data into the data bus."""
         for i in range(4):
             bit = (value >> i) & 0x01
             GPIO.output(self.pins[i + 7], bit)
-        self._pulse_enable()
+        self._pulse_enable(settle)
 
-    def _write8bits(self, value):
+    def _write8bits(self, value, settle=timing.EXECUTION_US):
         """Write 8 bits of data into the data bus."""
         for i in range(8):
             bit = (value >> i) & 0x01
             GPIO.output(self.pins[i + 3], bit)
-        self._pulse_enable()
+        self._pulse_enable(settle)
+
+    def _wait_executed(self, microseconds):
+        if not self._busy_polling:
+            c.usleep(microseconds)
 
-    def _pulse_enable(self):
-        """Pulse the `enable` flag to process data."""
+    def _read_busy(self):
+        """Read the busy flag on DB7. In 4 bit mode the second nibble, the
+        low bits of the address counter, has to be clocked out too."""
+        GPIO.output(self.pins.e, 1)
+        c.usleep(timing.ENABLE_PULSE_US)
+        busy = GPIO.input(self.pins.d7)
+        GPIO.output(self.pins.e, 0)
+        c.usleep(timing.ENABLE_PULSE_US)
+        if self.data_bus_mode == c.LCD_4BITMODE:
+            GPIO.output(self.pins.e, 1)
+            c.usleep(timing.ENABLE_PULSE_US)
+            GPIO.output(self.pins.e, 0)
+            c.usleep(timing.ENABLE_PULSE_US)
+        return busy
+
+    def _wait_busy(self, kind):
+        """Poll the busy flag until the controller is done and record how
+        long that took. If the flag never clears, RW is probably not wired:
+        go back to fixed delays."""
+        data_pins = [pin for pin in self.pins[3:11] if pin is not None]
+        # Stop driving the data pins before the display starts to
+        for pin in data_pins:
+            GPIO.setup(pin, GPIO.IN)
+        GPIO.output(self.pins.rs, c.RS_INSTRUCTION)
+        GPIO.output(self.pins.rw, 1)
+        started = timing.clock()
+        try:
+            while self._read_busy():
+                if timing.clock() - started > BUSY_TIMEOUT:
+                    print('LCD busy flag stuck, using fixed delays')
+                    self._busy_polling = False
+                    c.usleep(timing.CLEAR_HOME_US)
+                    return
+        finally:
+            GPIO.output(self.pins.rw, 0)
+            for pin in data_pins:
+                GPIO.setup(pin, GPIO.OUT)
+        elapsed = timing.clock() - started
+        stats = self.busy_latency.setdefault(kind, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def latency_report(self):
+        """Measured controller latency per command type as
+        ``{type: (count, mean us, max us)}``; empty without busy flag."""
+        return dict((kind, (count, total / count * 1e6, worst * 1e6))
+                    for kind, (count, total, worst) in self.busy_latency.items())
+
+    def _pulse_enable(self, settle=timing.EXECUTION_US):
+        """Pulse the `enable` flag to process data, then wait `settle`
+        microseconds for the controller."""
         GPIO.output(self.pins.e, 0)
-        c.usleep(1)
+        c.usleep(timing.ENABLE_PULSE_US)
         GPIO.output(self.pins.e, 1)
-        c.usleep(1)
+        c.usleep(timing.ENABLE_PULSE_US)
         GPIO.output(self.pins.e, 0)
-        c.usleep(100)  # commands need > 37us to settle
+        c.usleep(settle)  # commands need > 37us to settle
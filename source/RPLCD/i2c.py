@@ -23,11 +23,18 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 
+import math
+
 try:
     from smbus import SMBus
 except ImportError:
     from smbus2 import SMBus
 
+try:
+    from smbus2 import i2c_msg
+except ImportError:
+    i2c_msg = None
+
 from . import common as c
 from .lcd import BaseCharLCD
 
@@ -40,6 +47,16 @@ PCF8574_E = 0x4
 PIN_READ_WRITE = 0x2  # Not used?
 PIN_REGISTER_SELECT = 0x1  # Not used?
 
+# PCF8574 batched transfers: largest write_i2c_block_data payload (the
+# command byte goes out before it), largest i2c_rdwr message, and the time
+# one byte takes on the fastest bus the PCF8574 runs at (9 clocks, 400 kHz)
+SMBUS_BLOCK_MAX = 32
+I2C_MSG_MAX = 4096
+PCF8574_BYTE_US = 22.5
+# Waits up to this long are made by repeating the last output byte, longer
+# ones end the transfer and sleep
+PCF8574_MAX_PAD_US = 200
+
 # MCP230XX backlight control
 MCP230XX_BACKLIGHT = 0x80
 MCP230XX_NOBACKLIGHT = 0x7f
@@ -66,7 +83,8 @@ class CharLCD(BaseCharLCD):
                        cols=20, rows=4, dotsize=8,
                        charmap='A02',
                        auto_linebreaks=True,
-                       backlight_enabled=True):
+                       backlight_enabled=True,
+                       batched=True):
         """
         CharLCD via PCF8574 I2C port expander:
 
@@ -125,11 +143,20 @@ class CharLCD(BaseCharLCD):
         :type auto_linebreaks: bool
         :param backlight_enabled: Whether the backlight is enabled initially. Default: ``True``.
         :type backlight_enabled: bool
+        :param batched: PCF8574 only. Send each byte as one I2C transaction
+            instead of one per expander write, and everything a
+            ``write_string`` call sends in as few transactions as the bus
+            allows; the time the bytes take on the bus replaces the sleeps.
+            Default: ``True``.
+        :type batched: bool
 
         """
         # Set own address and port.
         self._address = address
         self._port = port
+        self.batched = batched
+        # PCF8574 output bytes collected while write_string is batching
+        self._batch = None
 
         # Set i2c expander, 'PCF8574', 'MCP23008' and 'MCP23017' are supported.
         if i2c_expander in ['PCF8574', 'MCP23008', 'MCP23017']:
@@ -221,10 +248,81 @@ class CharLCD(BaseCharLCD):
     backlight_enabled = property(_get_backlight_enabled, _set_backlight_enabled,
             doc='Whether or not to enable the backlight. Either ``True`` or ``False``.')
 
+    # High level commands
+
+    def write_string(self, value):
+        """Write the specified unicode string to the display, see
+        ``BaseCharLCD.write_string``. With ``batched`` on a PCF8574 all of
+        it goes out in as few I2C transactions as possible."""
+        if not self._pcf8574_batched() or self._batch is not None:
+            return super(CharLCD, self).write_string(value)
+        self._batch = []
+        try:
+            super(CharLCD, self).write_string(value)
+        finally:
+            # what was written is in the content cache already, send it even
+            # if something went wrong halfway
+            batch, self._batch = self._batch, None
+            self._write_bytes(batch)
+
     # Low level commands
 
+    def _pcf8574_batched(self):
+        return self.batched and self._i2c_expander == 'PCF8574'
+
+    def _pcf8574_bytes(self, value, mode):
+        """PCF8574 output bytes that clock ``value`` into the display: for
+        each nibble data and RS, then E high, then E low."""
+        data = []
+        for nibble in (value & 0xF0, (value << 4) & 0xF0):
+            bits = mode | nibble | self._backlight
+            data.extend((bits, bits | PCF8574_E, bits))
+        return data
+
+    def _pcf8574_send(self, value, mode):
+        data = self._pcf8574_bytes(value, mode)
+        if self._batch is not None:
+            self._batch.extend(data)
+        else:
+            self._write_bytes(data)
+
+    def _write_bytes(self, data):
+        """Write PCF8574 output bytes in as few transactions as possible. The
+        expander latches every byte of a write onto its pins, so a block
+        write's command byte is simply the first of them."""
+        if not data:
+            return
+        if i2c_msg is not None and hasattr(self.bus, 'i2c_rdwr'):
+            for start in range(0, len(data), I2C_MSG_MAX):
+                self.bus.i2c_rdwr(i2c_msg.write(self._address, data[start:start + I2C_MSG_MAX]))
+            return
+        step = SMBUS_BLOCK_MAX + 1
+        for start in range(0, len(data), step):
+            chunk = data[start:start + step]
+            if len(chunk) == 1:
+                self.bus.write_byte(self._address, chunk[0])
+            else:
+                self.bus.write_i2c_block_data(self._address, chunk[0], chunk[1:])
+
+    def _wait_executed(self, microseconds):
+        if not self._batch:
+            c.usleep(microseconds)
+            return
+        # The next byte's E only rises two bytes into what follows
+        pad = microseconds - 2 * PCF8574_BYTE_US
+        if pad <= 0:
+            return
+        if pad <= PCF8574_MAX_PAD_US:
+            self._batch.extend([self._batch[-1]] * int(math.ceil(pad / PCF8574_BYTE_US)))
+        else:
+            self._write_bytes(self._batch)
+            del self._batch[:]
+            c.usleep(microseconds)
+
     def _send_data(self, value):
-        if self._i2c_expander == 'PCF8574':
+        if self._pcf8574_batched():
+            self._pcf8574_send(value, c.RS_DATA)
+        elif self._i2c_expander == 'PCF8574':
             self.bus.write_byte(self._address, (c.RS_DATA | (value & 0xF0)) | self._backlight)
             self._pulse_data(c.RS_DATA | (value & 0xF0))
             self.bus.write_byte(self._address, (c.RS_DATA |
@@ -236,7 +334,9 @@ class CharLCD(BaseCharLCD):
             self._pulse_data(value & 0x0F)
 
     def _send_instruction(self, value):
-        if self._i2c_expander == 'PCF8574':
+        if self._pcf8574_batched():
+            self._pcf8574_send(value, c.RS_INSTRUCTION)
+        elif self._i2c_expander == 'PCF8574':
             self.bus.write_byte(self._address, (c.RS_INSTRUCTION |
                                                (value & 0xF0)) | self._backlight)
             self._pulse_data(c.RS_INSTRUCTION | (value & 0xF0))
@@ -90,6 +90,10 @@ class BaseCharLCD(object):
         self.auto_linebreaks = auto_linebreaks
         self.recent_auto_linebreak = False
 
+        # Whether the controller's address counter lags behind ``_cursor_pos``
+        # because unchanged bytes were skipped, see ``write``
+        self._cursor_pending = False
+
         # Initialize display
         self._init_connection()
 
@@ -115,13 +119,13 @@ class BaseCharLCD(object):
 
         # Write configuration to display
         self.command(c.LCD_FUNCTIONSET | displayfunction)
-        c.usleep(50)
+        self._wait_executed(50)
 
         # Configure display mode
         self._display_mode = c.LCD_DISPLAYON
         self._cursor_mode = c.CursorMode.hide
         self.command(c.LCD_DISPLAYCONTROL | self._display_mode | self._cursor_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
         # Clear display
         self.clear()
@@ -131,7 +135,7 @@ class BaseCharLCD(object):
         self._display_shift_mode = c.ShiftMode.cursor
         self._cursor_pos = (0, 0)
         self.command(c.LCD_ENTRYMODESET | self._text_align_mode | self._display_shift_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
     def close(self, clear=False):
         if clear:
@@ -151,8 +155,9 @@ class BaseCharLCD(object):
             raise ValueError(msg.format(pos=value, lcd=self.lcd))
         row_offsets = [0x00, 0x40, self.lcd.cols, 0x40 + self.lcd.cols]
         self._cursor_pos = value
+        self._cursor_pending = False
         self.command(c.LCD_SETDDRAMADDR | row_offsets[value[0]] + value[1])
-        c.usleep(50)
+        self._wait_executed(50)
 
     cursor_pos = property(_get_cursor_pos, _set_cursor_pos,
             doc='The cursor position as a 2-tuple (row, col).')
@@ -173,7 +178,7 @@ class BaseCharLCD(object):
         else:
             raise ValueError('Text align mode must be either `left` or `right`')
         self.command(c.LCD_ENTRYMODESET | self._text_align_mode | self._display_shift_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
     text_align_mode = property(_get_text_align_mode, _set_text_align_mode,
             doc='The text alignment (``left`` or ``right``).')
@@ -194,7 +199,7 @@ class BaseCharLCD(object):
         else:
             raise ValueError('Write shift mode must be either `cursor` or `display`.')
         self.command(c.LCD_ENTRYMODESET | self._text_align_mode | self._display_shift_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
     write_shift_mode = property(_get_write_shift_mode, _set_write_shift_mode,
             doc='The shift mode when writing (``cursor`` or ``display``).')
@@ -205,7 +210,7 @@ class BaseCharLCD(object):
     def _set_display_enabled(self, value):
         self._display_mode = c.LCD_DISPLAYON if value else c.LCD_DISPLAYOFF
         self.command(c.LCD_DISPLAYCONTROL | self._display_mode | self._cursor_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
     display_enabled = property(_get_display_enabled, _set_display_enabled,
             doc='Whether or not to display any characters.')
@@ -230,7 +235,7 @@ class BaseCharLCD(object):
         else:
             raise ValueError('Cursor mode must be one of `hide`, `line` or `blink`.')
         self.command(c.LCD_DISPLAYCONTROL | self._display_mode | self._cursor_mode)
-        c.usleep(50)
+        self._wait_executed(50)
 
     cursor_mode = property(_get_cursor_mode, _set_cursor_mode,
             doc='How the cursor should behave (``hide``, ``line`` or ``blink``).')
@@ -302,18 +307,24 @@ class BaseCharLCD(object):
                 else:
                     self.cursor_pos = (row, self.lcd.cols - 1)
 
+        # A visible cursor has to end up where the text ends
+        if self._cursor_mode != c.CursorMode.hide:
+            self._sync_cursor()
+
     def clear(self):
         """Overwrite display with blank characters and reset cursor position."""
         self.command(c.LCD_CLEARDISPLAY)
         self._cursor_pos = (0, 0)
+        self._cursor_pending = False
         self._content = [[0x20] * self.lcd.cols for _ in range(self.lcd.rows)]
-        c.msleep(2)
+        self._wait_executed(2000)
 
     def home(self):
         """Set cursor to initial position and reset any shifting."""
         self.command(c.LCD_RETURNHOME)
         self._cursor_pos = (0, 0)
-        c.msleep(2)
+        self._cursor_pending = False
+        self._wait_executed(2000)
 
     def shift_display(self, amount):
         """Shift the display. Use negative amounts to shift left and positive
@@ -323,7 +334,7 @@ class BaseCharLCD(object):
         direction = c.LCD_MOVERIGHT if amount > 0 else c.LCD_MOVELEFT
         for i in range(abs(amount)):
             self.command(c.LCD_CURSORSHIFT | c.LCD_DISPLAYMOVE | direction)
-            c.usleep(50)
+            self._wait_executed(50)
 
     def create_char(self, location, bitmap):
         """Create a new character.
@@ -376,8 +387,23 @@ class BaseCharLCD(object):
         """Send a raw command to the LCD."""
         self._send_instruction(value)
 
+    def _wait_executed(self, microseconds):
+        """Give the controller time to execute the command just sent.
+        Backends that can read the busy flag have already waited."""
+        c.usleep(microseconds)
+
+    def _sync_cursor(self):  # type: () -> None
+        """Send a cursor move that ``write`` deferred, if there is one."""
+        if self._cursor_pending:
+            self.cursor_pos = self._cursor_pos
+
     def write(self, value):  # type: (int) -> None
-        """Write a raw byte to the LCD."""
+        """Write a raw byte to the LCD.
+
+        Unchanged bytes are skipped. The cursor move past them is only sent
+        right before the next changed byte, so a run of skipped bytes costs
+        a single address command, and none if nothing follows.
+        """
 
         # Get current position
         row, col = self._cursor_pos
@@ -385,6 +411,7 @@ class BaseCharLCD(object):
         # Write byte if changed
         try:
             if self._content[row][col] != value:
+                self._sync_cursor()
                 self._send_data(value)
                 self._content[row][col] = value  # Update content cache
                 unchanged = False
@@ -394,6 +421,7 @@ class BaseCharLCD(object):
             # Position out of range
             if self.auto_linebreaks is True:
                 raise e
+            self._sync_cursor()
             self._send_data(value)
             unchanged = False
 
@@ -401,36 +429,64 @@ class BaseCharLCD(object):
         if self.text_align_mode == 'left':
             if self.auto_linebreaks is False or col < self.lcd.cols - 1:
                 # No newline, update internal pointer
-                newpos = (row, col + 1)
-                if unchanged:
-                    self.cursor_pos = newpos
-                else:
-                    self._cursor_pos = newpos
+                self._cursor_pos = (row, col + 1)
+                self._cursor_pending = self._cursor_pending or unchanged
                 self.recent_auto_linebreak = False
             else:
-                # Newline, reset pointer
+                # Newline, reset pointer; the controller's counter does not
+                # follow rows, so the move is always deferred
                 if row < self.lcd.rows - 1:
-                    self.cursor_pos = (row + 1, 0)
+                    self._cursor_pos = (row + 1, 0)
                 else:
-                    self.cursor_pos = (0, 0)
+                    self._cursor_pos = (0, 0)
+                self._cursor_pending = True
                 self.recent_auto_linebreak = True
         else:
             if self.auto_linebreaks is False or col > 0:
                 # No newline, update internal pointer
-                newpos = (row, col - 1)
-                if unchanged:
-                    self.cursor_pos = newpos
-                else:
-                    self._cursor_pos = newpos
+                self._cursor_pos = (row, col - 1)
+                self._cursor_pending = self._cursor_pending or unchanged
                 self.recent_auto_linebreak = False
             else:
                 # Newline, reset pointer
                 if row < self.lcd.rows - 1:
-                    self.cursor_pos = (row + 1, self.lcd.cols - 1)
+                    self._cursor_pos = (row + 1, self.lcd.cols - 1)
                 else:
-                    self.cursor_pos = (0, self.lcd.cols - 1)
+                    self._cursor_pos = (0, self.lcd.cols - 1)
+                self._cursor_pending = True
                 self.recent_auto_linebreak = True
 
+    def write_at(self, pos, values):  # type: (Tuple[int, int], Sequence[int]) -> int
+        """Write raw bytes from ``pos`` on, all within that row.
+
+        Every byte is sent, whether the content cache has it or not, and
+        the cache is updated. The address command is left out if the
+        controller's cursor is at ``pos`` already. Returns the number of
+        address commands sent, 0 or 1.
+        """
+        row, col = pos
+        end = col + len(values)
+        if end > self.lcd.cols:
+            raise ValueError('{} bytes from column {} do not fit a row of {}.'.format(
+                len(values), col, self.lcd.cols))
+        commands = 0
+        if self._cursor_pending or self._cursor_pos != (row, col):
+            self.cursor_pos = (row, col)
+            commands = 1
+        # If a byte fails to go out the controller's position is unknown
+        self._cursor_pending = True
+        for offset, value in enumerate(values):
+            self._send_data(value)
+            self._content[row][col + offset] = value
+        if end < self.lcd.cols:
+            self._cursor_pos = (row, end)
+            self._cursor_pending = False
+        else:
+            # The controller's counter has left the row, it is re-addressed
+            # before anything else is written
+            self._cursor_pos = (row + 1 if row < self.lcd.rows - 1 else 0, 0)
+        return commands
+
     def cr(self):  # type: () -> None
         """Write a carriage return (``\\r``) character to the LCD."""
         self.write_string('\r')
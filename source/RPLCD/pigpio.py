@@ -28,6 +28,7 @@ from collections import namedtuple
 import pigpio
 
 from . import common as c
+from . import timing
 from .lcd import BaseCharLCD
 from .compat import range
 
@@ -41,6 +42,10 @@ PWM = 0.125
 
 PinConfig = namedtuple('PinConfig', 'rs rw e e2 d0 d1 d2 d3 d4 d5 d6 d7 backlight contrast')
 
+# Pulses per wave sent to pigpiod; a byte takes 3 (8 bit) or 6 (4 bit),
+# well below the DMA limit of the smallest configuration
+MAX_WAVE_PULSES = 3000
+
 
 class CharLCD(BaseCharLCD):
     def __init__(self, pi,
@@ -52,7 +57,8 @@ class CharLCD(BaseCharLCD):
                        contrast_pwm=None, contrast=0.5,
                        cols=20, rows=4, dotsize=8,
                        charmap='A02',
-                       auto_linebreaks=True):
+                       auto_linebreaks=True,
+                       batched=True):
         """
         Character LCD controller.
 
@@ -118,11 +124,19 @@ class CharLCD(BaseCharLCD):
         :param auto_linebreaks: Whether or not to automatically insert line
             breaks. Default: ``True``.
         :type auto_linebreaks: bool
+        :param batched: Send everything one ``write_string`` call writes to
+            pigpiod as a single wave, instead of running the write script
+            once per byte. Waves are shared by all pigpiod clients, turn this
+            off if another program uses them. Default: ``True``.
+        :type batched: bool
 
         """
 
         # Save the pigpio.pi object
         self.pi = pi
+        self.batched = batched
+        # (value, mode, settle) collected while write_string is batching
+        self._batch = None
 
         # Set attributes
         if pin_rs is None:
@@ -158,7 +172,8 @@ class CharLCD(BaseCharLCD):
             self.backlight_enabled = backlight_enabled
 
         # Set contrast
-        self.contrast = contrast
+        if pin_contrast is not None:
+            self.contrast = contrast
 
     def _init_connection(self):
         # Setup GPIO
@@ -293,12 +308,89 @@ class CharLCD(BaseCharLCD):
     contrast = property(_get_contrast, _set_contrast,
             doc='Set the LCD contrast.')
 
+    # High level commands
+
+    def write_string(self, value):
+        """Write the specified unicode string to the display, see
+        ``BaseCharLCD.write_string``. With ``batched`` every byte and cursor
+        move it needs reaches pigpiod as one wave."""
+        if not self.batched or self._batch is not None:
+            return super(CharLCD, self).write_string(value)
+        self._batch = []
+        try:
+            super(CharLCD, self).write_string(value)
+        finally:
+            # what was written is in the content cache already, send it even
+            # if something went wrong halfway
+            batch, self._batch = self._batch, None
+            self._send_batch(batch)
+
     # Low level commands
 
+    def _wait_executed(self, microseconds):
+        if self._batch:
+            # stretch the wait after the last pulse in the wave instead
+            value, mode, settle = self._batch[-1]
+            self._batch[-1] = (value, mode, max(settle, microseconds))
+        else:
+            c.usleep(microseconds)
+
+    def _wave_pulses(self, batch):
+        """pigpio pulses that clock every (value, mode, settle) of ``batch``
+        into the display. Only the second nibble of a byte is followed by
+        the execution time, batches are never sent during the init sequence."""
+        if self.data_bus_mode == c.LCD_8BITMODE:
+            data_pins = self.pins[4:12]
+        else:
+            data_pins = self.pins[8:12]
+        bus_mask = 1 << self.pins.rs
+        for pin in data_pins:
+            bus_mask |= 1 << pin
+        if self.pins.rw is not None:
+            bus_mask |= 1 << self.pins.rw
+        enable = 1 << self.pins.e
+
+        pulses = []
+        for value, mode, settle in batch:
+            if self.data_bus_mode == c.LCD_8BITMODE:
+                chunks = [value]
+            else:
+                chunks = [value >> 4, value & 0x0f]
+            for i, chunk in enumerate(chunks):
+                on = (1 << self.pins.rs) if mode == c.RS_DATA else 0
+                for bit, pin in enumerate(data_pins):
+                    if (chunk >> bit) & 0x01:
+                        on |= 1 << pin
+                # data and RS, then E high, then E low and wait for the controller
+                pulses.append(pigpio.pulse(on, bus_mask & ~on, timing.ENABLE_PULSE_US))
+                pulses.append(pigpio.pulse(enable, 0, timing.ENABLE_PULSE_US))
+                pulses.append(pigpio.pulse(0, enable,
+                                           settle if i == len(chunks) - 1 else timing.ENABLE_PULSE_US))
+        return pulses
+
+    def _send_batch(self, batch):
+        """Send ``batch`` as waves of at most MAX_WAVE_PULSES pulses, waiting
+        for each to finish."""
+        pulses = self._wave_pulses(batch)
+        for start in range(0, len(pulses), MAX_WAVE_PULSES):
+            chunk = pulses[start:start + MAX_WAVE_PULSES]
+            self.pi.wave_add_generic(chunk)
+            wave = self.pi.wave_create()
+            self.pi.wave_send_once(wave)
+            # ask pigpiod only once the wave should be done
+            c.usleep(sum(pulse.delay for pulse in chunk))
+            while self.pi.wave_tx_busy():
+                c.usleep(timing.EXECUTION_US)
+            self.pi.wave_delete(wave)
+
     def _send(self, value, mode):
         """Send the specified value to the display with automatic 4bit / 8bit
         selection. The rs_mode is either ``RS_DATA`` or ``RS_INSTRUCTION``."""
 
+        if self._batch is not None:
+            self._batch.append((value, mode, timing.EXECUTION_US))
+            return
+
         # Assemble the parameters sent to the pigpio script
         params = [mode]
         params.extend([(value >> i) & 0x01 for i in range(8)])
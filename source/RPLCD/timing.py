@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Delays of a few microseconds that actually last a few microseconds.
+
+``time.sleep()`` on Linux overshoots by 50-100 us or more, which is longer
+than most HD44780 timings. ``delay()`` sleeps only for the part of a wait
+that is safely longer than that overshoot and spins on a high resolution
+clock for the rest. The overshoot is measured once, on first use, and
+cached for the lifetime of the process.
+
+Run ``python -m RPLCD.timing`` to see how close the delays get, and add
+a backend (``gpio``, ``i2c`` or ``pigpio``) with its wiring to measure the
+characters per second it reaches with and without precise delays.
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from collections import namedtuple
+import time
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# HD44780 timings with some margin, in microseconds (Hitachi manual pages 24, 49, 52)
+ENABLE_PULSE_US = 1  # E high >= 450 ns, E cycle >= 1 us
+EXECUTION_US = 41  # most instructions and data writes, 37 us at 270 kHz
+CLEAR_HOME_US = 1640  # clear display and return home, 1.52 ms at 270 kHz
+
+# Sleeping is cut short by this much on top of the measured overshoot
+SLEEP_MARGIN = 20e-6
+CALIBRATION_SAMPLES = 50
+
+Calibration = namedtuple('Calibration', 'sleep_overshoot clock_cost')
+
+# Set to False to get back plain time.sleep() delays, e.g. to compare
+precise = True
+
+_calibration = None
+
+
+def calibrate(samples=CALIBRATION_SAMPLES):
+    """Measure how much ``time.sleep()`` overshoots and what reading the
+    clock costs. Uses the worst of the fastest half of the samples, so one
+    preempted sample does not make every later delay spin longer."""
+    overshoots = []
+    for _ in range(samples):
+        started = clock()
+        time.sleep(1e-6)
+        overshoots.append(clock() - started)
+    overshoots.sort()
+    started = clock()
+    for _ in range(1000):
+        clock()
+    clock_cost = (clock() - started) / 1000
+    return Calibration(sleep_overshoot=overshoots[len(overshoots) // 2],
+                       clock_cost=clock_cost)
+
+
+def calibration():
+    """The cached calibration, measured on first call."""
+    global _calibration
+    if _calibration is None:
+        _calibration = calibrate()
+    return _calibration
+
+
+def delay(seconds):
+    """Wait at least ``seconds``, sleeping where that is safe and spinning
+    for the rest."""
+    if not precise:
+        time.sleep(seconds)
+        return
+    deadline = clock() + seconds
+    sleepable = seconds - calibration().sleep_overshoot - SLEEP_MARGIN
+    if sleepable > 0:
+        time.sleep(sleepable)
+    while clock() < deadline:
+        pass
+
+
+def udelay(microseconds):
+    delay(microseconds / 1000000.0)
+
+
+def mdelay(milliseconds):
+    delay(milliseconds / 1000.0)
+
+
+# # # BENCHMARK # # #
+
+def delay_accuracy(microseconds=(1, ENABLE_PULSE_US, EXECUTION_US, 50, 100, CLEAR_HOME_US),
+                   repeat=200):
+    """(requested, mean achieved, worst achieved) in microseconds for each
+    delay, with the current ``precise`` setting."""
+    result = []
+    for us in microseconds:
+        achieved = []
+        for _ in range(repeat):
+            started = clock()
+            udelay(us)
+            achieved.append((clock() - started) * 1e6)
+        result.append((us, sum(achieved) / len(achieved), max(achieved)))
+    return result
+
+
+def chars_per_second(lcd, count=800):
+    """Characters per second ``lcd`` writes. Two alternating 40 character
+    lines are written so the content cache never skips a byte."""
+    lines = ['0123456789' * 4, 'ABCDEFGHIJ' * 4]
+    cols = min(lcd.lcd.cols, 40)
+    written = 0
+    started = clock()
+    while written < count:
+        lcd.cursor_pos = (0, 0)
+        lcd.write_string(lines[(written // cols) % 2][:cols])
+        written += cols
+    return written / (clock() - started)
+
+
+def benchmark(lcds, count=800):
+    """Print delay accuracy, then characters per second of every backend in
+    ``lcds`` (name -> display) with time.sleep() delays and precise ones."""
+    global precise
+    cal = calibration()
+    print('time.sleep overshoot {:.1f} us, clock read {:.2f} us'.format(
+        cal.sleep_overshoot * 1e6, cal.clock_cost * 1e6))
+    saved = precise
+    try:
+        for mode in (False, True):
+            precise = mode
+            print('{} delays:'.format('precise' if mode else 'time.sleep'))
+            for us, mean, worst in delay_accuracy():
+                print('  {:5d} us -> mean {:8.1f} us, worst {:8.1f} us'.format(us, mean, worst))
+        for name, lcd in sorted(lcds.items()):
+            rates = []
+            for mode in (False, True):
+                precise = mode
+                rates.append(chars_per_second(lcd, count))
+            print('{}: {:.0f} chars/s with time.sleep, {:.0f} chars/s precise'.format(
+                name, rates[0], rates[1]))
+    finally:
+        precise = saved
+
+
+def _pins(value):
+    return [int(pin) for pin in value.split(',')]
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='HD44780 delay and throughput benchmark')
+    parser.add_argument('backends', nargs='*', metavar='{gpio,i2c,pigpio}',
+                        help='backends to measure, each needs a display attached')
+    parser.add_argument('--rs', type=int, default=26)
+    parser.add_argument('--e', type=int, default=19)
+    parser.add_argument('--data', type=_pins, default=[13, 6, 5, 11])
+    parser.add_argument('--expander', default='PCF8574')
+    parser.add_argument('--address', type=lambda v: int(v, 0), default=0x27)
+    parser.add_argument('--cols', type=int, default=40)
+    parser.add_argument('--rows', type=int, default=2)
+    parser.add_argument('--count', type=int, default=800)
+    args = parser.parse_args(argv)
+    for backend in args.backends:
+        if backend not in ('gpio', 'i2c', 'pigpio'):
+            parser.error('unknown backend {!r}'.format(backend))
+
+    lcds = {}
+    for backend in args.backends:
+        if backend == 'gpio':
+            import RPi.GPIO as GPIO
+            from .gpio import CharLCD
+            lcds[backend] = CharLCD(numbering_mode=GPIO.BCM, pin_rs=args.rs, pin_e=args.e,
+                                    pins_data=args.data, cols=args.cols, rows=args.rows)
+        elif backend == 'i2c':
+            from .i2c import CharLCD
+            lcds[backend] = CharLCD(args.expander, args.address, cols=args.cols, rows=args.rows)
+        else:
+            import pigpio
+            from .pigpio import CharLCD
+            lcds[backend] = CharLCD(pigpio.pi(), pin_rs=args.rs, pin_e=args.e,
+                                    pins_data=args.data, cols=args.cols, rows=args.rows)
+    try:
+        benchmark(lcds, args.count)
+    finally:
+        for lcd in lcds.values():
+            lcd.close(clear=True)
+
+
+if __name__ == '__main__':
+    main()
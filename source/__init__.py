@@ -3,6 +3,8 @@
 from record_data import record_data
 from transfer_usb import transfer_usb
 import system_functions
+import catalog
+import transfer
 import myLCD
 import cutie
 import os
@@ -12,6 +14,14 @@ from time import sleep, strftime
 #press cancel button 5 times in a row to exit the program
 cancel_count = 0
 
+def transfer_running():
+	# nothing else may run while the stick is being written
+	if not transfer.busy():
+		return False
+	myLCD.updateLCD(str2='USB TRANSFER RUNNING', str3='WAIT OR CANCEL IT IN TRANSFER DATA')
+	sleep(1)
+	return True
+
 def select_option():
 	global cancel_count
 
@@ -24,12 +34,16 @@ def select_option():
 	if selected_option == -1:
 		cancel_count += 1
 	elif selected_option == 0:
-		record_data()
 		cancel_count = 0
+		if transfer_running():
+			return
+		record_data()
 	elif selected_option == 1:
 		transfer_usb()
 		cancel_count = 0
 	elif selected_option == 2:
+		if transfer_running():
+			return
 		options = [
 			'DELETE FILE', 
 			'SET CLOCK']
@@ -49,6 +63,9 @@ def main():
 		os.remove("/home/pi/accelerometer_raspi/source/shutdown")
 	except (OSError):
 		pass
+
+	# index recordings changed while we were off and start watching for new ones
+	catalog.get_catalog()
 	
 	myLCD.updateLCD(str2="WELCOME", str3="REXNORD EDGE DEVICE")
 	sleep(2)
@@ -59,7 +76,9 @@ def main():
 	while True:
 		select_option()
 		cutie.getTime()
-		if cancel_count >= 3:
+		if cancel_count >= 3 and transfer_running():
+			cancel_count = 0
+		elif cancel_count >= 3:
 			myLCD.clear_all()
 			options = ['EXIT', 'SHUTDOWN']
 			selected_option = cutie.select(options, selected_index = 0)
@@ -0,0 +1,308 @@
+import datetime
+import os
+import threading
+import time
+
+import recording
+import ringbuffer
+import sensor
+
+# Recordings live next to the ones the Java tool used to write
+RECORD_DIR = '/home/pi'
+
+# Acquisition modes
+POLLED = 'polled'
+FIFO = 'fifo'
+
+# Drain the FIFO when it is about this full, leaving headroom for slow writes
+FIFO_DRAIN_FILL = 0.4
+
+
+def recording_path(directory=RECORD_DIR, extension=recording.BINARY_EXTENSION, now=None):
+    """Path of a new recording named after the time it was started."""
+    now = now or datetime.datetime.now()
+    name = 'mpu6050_{}{}'.format(now.strftime('%Y-%m-%d_%H:%M:%S'), extension)
+    return os.path.join(directory, name)
+
+
+class Recorder(object):
+    """Samples an MPU6050 and writes a recording, each on its own thread.
+
+    Replaces the `java -jar BannerQM42TestApplication.jar` subprocess: there
+    is no JVM to start, the first sample is read as soon as start() returns.
+
+    In POLLED mode every sample is one 14 byte register burst paced by the
+    host. In FIFO mode the sensor paces itself into its hardware FIFO and
+    the thread drains it in block reads, which is what makes 1 kHz work.
+    Samples lost to a FIFO overflow or a stalled poll are counted in `lost`.
+
+    The acquisition thread only copies raw samples into a preallocated
+    RingBuffer holding `buffer_seconds` of data, the writer thread writes
+    them out: unchanged into a binary recording, in compressed blocks if
+    `path` ends in .mpz, or converted to rows if it ends in .csv. The UI
+    should only read the counters: `samples`, `written`, `lost` and the
+    buffer's `high_water`, `overruns`, `dropped`.
+
+    With `segment_seconds` set the recording is split into files of that
+    length, each named after the time of its first sample and listed in
+    `segments`. `on_open` and `on_segment` are called with the path and
+    recording.Header of every segment when it is created and once it is
+    closed, so finished segments can be cataloged and evicted while
+    recording.
+    """
+
+    def __init__(self, mpu, path, rate=100, mode=POLLED, buffer_seconds=10,
+                 segment_seconds=None, on_open=None, on_segment=None):
+        if mode not in (POLLED, FIFO):
+            raise ValueError('mode must be either {!r} or {!r}'.format(POLLED, FIFO))
+        self.mpu = mpu
+        self.path = path
+        self.mode = mode
+        self.requested_rate = rate
+        self.rate = rate
+        self.buffer_seconds = buffer_seconds
+        self.buffer = None
+        self.segment_seconds = segment_seconds
+        self.segments = []
+        self.on_open = on_open
+        self.on_segment = on_segment
+        self.samples = 0
+        self.written = 0
+        self.overflows = 0
+        self.lost = 0
+        self.error = None
+        self.started = None
+        self.first_sample = None
+        self.stopped = None
+        # (sample index, time of that sample) each time the sample clock restarts
+        self._time_base = []
+        self._base = 0
+        self._stop = threading.Event()
+        self._acquire_thread = None
+        self._writer_thread = None
+        self._writer = None
+
+    def start(self):
+        self.started = time.time()
+        self.rate = self.mpu.configure(self.requested_rate)
+        capacity = max(sensor.FIFO_SIZE // sensor.SAMPLE_SIZE, int(self.rate * self.buffer_seconds))
+        self.buffer = ringbuffer.RingBuffer(capacity, sensor.SAMPLE_SIZE)
+        self._open_segment(self.path, 0, self.started)
+        target = self._acquire_fifo if self.mode == FIFO else self._acquire_polled
+        self._acquire_thread = threading.Thread(target=target, name='mpu6050-acquire')
+        self._acquire_thread.daemon = True
+        self._writer_thread = threading.Thread(target=self._write_loop, name='mpu6050-writer')
+        self._writer_thread.daemon = True
+        self._writer_thread.start()
+        self._acquire_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._acquire_thread is not None:
+            self._acquire_thread.join()
+            # the last sample is in, what is left is only the writer catching up
+            self.stopped = time.time()
+            self.buffer.close()
+            self._writer_thread.join()
+        else:
+            self.stopped = time.time()
+
+    @property
+    def running(self):
+        return self._acquire_thread is not None and self._acquire_thread.is_alive()
+
+    @property
+    def startup_latency(self):
+        """Seconds between start() and the first sample being read."""
+        if self.first_sample is None:
+            return None
+        return self.first_sample - self.started
+
+    @property
+    def achieved_rate(self):
+        """Sustained samples per second written since the first sample."""
+        end = self.stopped or time.time()
+        if self.first_sample is None or end <= self.first_sample:
+            return 0.0
+        return self.written / (end - self.first_sample)
+
+    def _sample_time(self, index):
+        base = self._base
+        while base + 1 < len(self._time_base) and self._time_base[base + 1][0] <= index:
+            base += 1
+        self._base = base
+        start, timestamp = self._time_base[base]
+        return timestamp + (index - start) / self.rate
+
+    def _open_segment(self, path, first_sample, start_time):
+        header = recording.Header(self.rate, start_time, self.mpu.accel_scale,
+                                  self.mpu.gyro_scale)
+        self._writer = recording.open_writer(path, header, self._sample_time, first_sample)
+        self._segment_start = first_sample
+        self._segment_lost = self.lost + self.buffer.dropped
+        self.segments.append(path)
+        if self.on_open is not None:
+            self.on_open(path, header)
+
+    def _close_segment(self):
+        """Close the open segment, if there still is one. on_segment is
+        called even if closing fails, so the segment is not left open."""
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        header = writer.header
+        if header.samples:
+            header.start_time = self._sample_time(self._segment_start)
+        header.lost = self.lost + self.buffer.dropped - self._segment_lost
+        try:
+            writer.close()
+        finally:
+            if self.on_segment is not None:
+                self.on_segment(writer.path, header)
+
+    def _next_segment(self):
+        self._close_segment()
+        start_time = self._sample_time(self.written)
+        directory, name = os.path.split(self.path)
+        path = recording_path(directory, os.path.splitext(name)[1],
+                              datetime.datetime.fromtimestamp(start_time))
+        if path in self.segments:
+            # Two segments starting within the same second
+            path = '{}_{}{}'.format(os.path.splitext(path)[0], len(self.segments),
+                                    os.path.splitext(path)[1])
+        self._open_segment(path, self.written, start_time)
+
+    def _restart_clock(self, timestamp):
+        self._time_base.append((self.samples, timestamp))
+        if self.first_sample is None:
+            self.first_sample = timestamp
+
+    def _store(self, data):
+        self.samples += self.buffer.put(data)
+
+    # Acquisition thread
+
+    def _acquire_polled(self):
+        period = 1.0 / self.rate
+        next_sample = time.time()
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if now < next_sample:
+                    time.sleep(next_sample - now)
+                    now = time.time()
+                data = self.mpu.read_bytes()
+                if not self._time_base or now - next_sample > period:
+                    # First sample, or the poll stalled: restart the clock
+                    if self._time_base:
+                        self.lost += int((now - next_sample) / period)
+                    self._restart_clock(now)
+                    next_sample = now
+                self._store(data)
+                next_sample += period
+        except (IOError, OSError) as e:
+            self.error = e
+
+    def _acquire_fifo(self):
+        period = 1.0 / self.rate
+        poll_interval = FIFO_DRAIN_FILL * sensor.FIFO_SIZE / sensor.SAMPLE_SIZE * period
+        try:
+            self.mpu.enable_fifo()
+            # FIFO samples carry no timestamp, they are spaced by the sample
+            # period from the moment the FIFO was (re)started.
+            run_start = time.time()
+            run_samples = 0
+            self._restart_clock(run_start + period)
+            stopping = False
+            while not stopping:
+                stopping = self._stop.wait(poll_interval)
+                if stopping:
+                    # Stop capture first so the final drain empties the FIFO
+                    self.mpu.stop_fifo_capture()
+                if self.mpu.fifo_overflowed():
+                    # The FIFO is misaligned after an overflow, account for
+                    # what we could not read and start over.
+                    now = time.time()
+                    self.overflows += 1
+                    self.lost += max(0, int((now - run_start) * self.rate) - run_samples)
+                    self.mpu.reset_fifo()
+                    run_start = now
+                    run_samples = 0
+                    self._restart_clock(run_start + period)
+                    continue
+                count = self.mpu.fifo_count()
+                count -= count % sensor.SAMPLE_SIZE
+                if count == 0:
+                    continue
+                self._store(self.mpu.read_fifo(count))
+                run_samples += count // sensor.SAMPLE_SIZE
+            self.mpu.disable_fifo()
+        except (IOError, OSError) as e:
+            self.error = e
+
+    # Writer thread
+
+    def _write_loop(self):
+        segment_records = None
+        if self.segment_seconds:
+            segment_records = max(1, int(self.segment_seconds * self.rate))
+        try:
+            while True:
+                if not self.buffer.wait(0.5):
+                    if self.buffer.closed:
+                        break
+                    continue
+                for view in self.buffer.peek():
+                    while len(view):
+                        count = len(view) // sensor.SAMPLE_SIZE
+                        if segment_records is not None:
+                            count = min(count, self._segment_start + segment_records - self.written)
+                        self._writer.write(view[:count * sensor.SAMPLE_SIZE])
+                        view = view[count * sensor.SAMPLE_SIZE:]
+                        self.written += count
+                        self.buffer.consume(count)
+                        if (segment_records is not None and
+                                self.written - self._segment_start >= segment_records):
+                            self._next_segment()
+        except (IOError, OSError) as e:
+            self.error = e
+        finally:
+            try:
+                self._close_segment()
+            except (IOError, OSError) as e:
+                if self.error is None:
+                    self.error = e
+
+
+def benchmark(duration=2.0, rate=1000, latency=0.0, mode=FIFO,
+              extension=recording.BINARY_EXTENSION):
+    """Record from a SimulatedBus into /tmp and print the achieved figures."""
+    bus = sensor.SimulatedBus(latency=latency)
+    mpu = sensor.MPU6050(bus)
+    path = recording_path('/tmp', extension)
+    recorder = Recorder(mpu, path, rate=rate, mode=mode)
+    recorder.start()
+    time.sleep(duration)
+    recorder.stop()
+    print('mode: {}, {} bus transactions'.format(mode, bus.transactions))
+    print('startup latency: {:.2f} ms'.format(recorder.startup_latency * 1000))
+    print('samples: {} in {:.2f} s ({:.1f} samples/s, requested {:.0f})'.format(
+        recorder.samples, recorder.stopped - recorder.first_sample,
+        recorder.achieved_rate, recorder.rate))
+    if mode == FIFO:
+        print('produced by sensor: {}, dropped: {}, overflows: {}, lost: {}'.format(
+            bus.produced, bus.dropped, recorder.overflows, recorder.lost))
+    buf = recorder.buffer
+    print('ring buffer: {} records, high water {} ({:.1f}%), {} overruns, {} dropped'.format(
+        buf.capacity, buf.high_water, 100.0 * buf.high_water / buf.capacity,
+        buf.overruns, buf.dropped))
+    print('file: {} ({} bytes)'.format(path, os.path.getsize(path)))
+    os.remove(path)
+    return recorder
+
+
+if __name__ == '__main__':
+    benchmark(mode=POLLED)
+    benchmark(mode=FIFO)
+    benchmark(mode=FIFO, extension=recording.CSV_EXTENSION)
+    benchmark(mode=FIFO, extension=recording.COMPRESSED_EXTENSION)
@@ -0,0 +1,267 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import acquisition
+import recording
+import watcher
+
+CATALOG_PATH = os.path.join(acquisition.RECORD_DIR, '.recordings.db')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    start REAL NOT NULL,
+    duration REAL,
+    size INTEGER NOT NULL DEFAULT 0,
+    samples INTEGER,
+    format TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS recordings_start ON recordings (start);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+'''
+
+# Recordings are named ..._YYYY-mm-dd_HH:MM:SS.ext by both the recorder and the Java tool
+# A file found by a scan that was modified this recently is still being written
+GROWING_SECONDS = 10
+NAME_TIME = re.compile(r'(\d{4}-\d{2}-\d{2})_(\d{2}:\d{2}:\d{2})')
+# The whole name of such a recording, or a segment of one (..._HH:MM:SS_2.ext)
+RECORDING_NAME = re.compile(r'_' + NAME_TIME.pattern + r'(_\d+)?\.[^.]+$')
+
+
+class Recording(object):
+    """One row of the catalog."""
+
+    def __init__(self, path, start, duration, size, samples, format, complete, mtime):
+        self.path = path
+        self.start = start
+        self.duration = duration
+        self.size = size
+        self.samples = samples
+        self.format = format
+        self.complete = bool(complete)
+        self.mtime = mtime
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def label(self, number):
+        """Menu label that fits a 40 column line after the select prefix."""
+        start = datetime.datetime.fromtimestamp(self.start).strftime('%Y-%m-%d %H:%M')
+        if self.duration is None:
+            duration = '?'
+        else:
+            minutes = int(self.duration // 60)
+            duration = '{}:{:02d}'.format(minutes // 60, minutes % 60)
+        return '{}. {} {} {:.1f}MB'.format(number, start, duration, self.size / 1e6)
+
+
+def recording_format(path):
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def in_directory(path, directory):
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(directory)
+
+
+def is_recorded_file(path, directory=acquisition.RECORD_DIR):
+    """True for a recording named by the recorder (or the Java tool) directly
+    in `directory`: the only files that may ever be deleted to free space."""
+    name = os.path.basename(path)
+    return (in_directory(path, directory) and recording.is_recording(name) and
+            RECORDING_NAME.search(name) is not None)
+
+
+def start_time_from_name(path, default=None):
+    match = NAME_TIME.search(os.path.basename(path))
+    if match is None:
+        return default
+    start = datetime.datetime.strptime(' '.join(match.groups()), '%Y-%m-%d %H:%M:%S')
+    return time.mktime(start.timetuple())
+
+
+class Catalog(object):
+    """Persistent index of every recording, kept up to date by the recorder.
+
+    Menus list recordings from here instead of walking the home directory.
+    Safe to use from the recorder's writer thread, the directory watcher and
+    the UI at once.
+    """
+
+    def __init__(self, path=CATALOG_PATH, directory=acquisition.RECORD_DIR):
+        self.path = path
+        created = not os.path.exists(path)
+        self._lock = threading.Lock()
+        # recordings the recorder has open, they stay incomplete until closed
+        self._open = set()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self.watcher = None
+        if created:
+            # First run: import whatever was recorded before the catalog existed
+            for file in recording.find_recordings_in(directory):
+                self.add_file(file)
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self._lock:
+            self._db.close()
+
+    def _upsert(self, path, start, duration, size, samples, complete, mtime):
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO recordings '
+                '(path, start, duration, size, samples, format, complete, mtime) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, start, duration, size, samples, recording_format(path),
+                 int(complete), mtime))
+
+    def open_recording(self, path, header):
+        """Register a recording (or segment) the recorder just created."""
+        with self._lock:
+            self._open.add(path)
+        self._upsert(path, header.start_time, None, 0, 0, False, None)
+
+    def close_recording(self, path, header=None):
+        """Update size, duration and sample count of a finished recording."""
+        with self._lock:
+            self._open.discard(path)
+        if header is None:
+            self.add_file(path, closed=True)
+            return
+        st = os.stat(path)
+        self._upsert(path, header.start_time, header.duration, st.st_size, header.samples,
+                     True, st.st_mtime)
+
+    def add_partial(self, path):
+        """Register a file someone else is still writing."""
+        self._upsert(path, start_time_from_name(path, time.time()), None, 0, None, False, None)
+
+    def add_file(self, path, closed=False):
+        """Catalog a file found on disk, reading what its format allows.
+
+        It is complete unless the recorder has it open or, when `closed`
+        does not say its writer just closed it, it was modified in the last
+        GROWING_SECONDS.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return None
+        start = start_time_from_name(path, st.st_mtime)
+        duration = samples = None
+        if recording.is_binary(path) or recording.is_compressed(path):
+            try:
+                header = recording.read_header(path)
+            except (ValueError, IOError, OSError):
+                pass
+            else:
+                start, duration, samples = header.start_time, header.duration, header.samples
+        with self._lock:
+            complete = path not in self._open
+        if not closed and time.time() - st.st_mtime < GROWING_SECONDS:
+            complete = False
+        self._upsert(path, start, duration, st.st_size, samples, complete, st.st_mtime)
+        return self.get(path)
+
+    def remove(self, path):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM recordings WHERE path = ?', (path,))
+
+    def get(self, path):
+        with self._lock:
+            row = self._db.execute('SELECT path, start, duration, size, samples, format, complete, '
+                                   'mtime FROM recordings WHERE path = ?', (path,)).fetchone()
+        return Recording(*row) if row else None
+
+    def recordings(self, complete_only=False):
+        """All recordings, oldest first."""
+        query = ('SELECT path, start, duration, size, samples, format, complete, mtime '
+                 'FROM recordings')
+        if complete_only:
+            query += ' WHERE complete = 1'
+        with self._lock:
+            rows = self._db.execute(query + ' ORDER BY start').fetchall()
+        return [Recording(*row) for row in rows]
+
+    def reconcile(self, directory=acquisition.RECORD_DIR):
+        """Add and drop entries for files changed outside the app in `directory`.
+
+        Nothing is listed if the directory's mtime is the one seen last time,
+        and only new files or files whose mtime changed are read. Only that
+        directory is listed, nothing below it, and entries for files outside
+        it are dropped. Files an earlier scan found still being written are
+        looked at again either way.
+        """
+        for r in self.recordings():
+            if not in_directory(r.path, directory):
+                self.remove(r.path)
+            elif not r.complete and r.path not in self._open:
+                self.add_file(r.path)
+        mtime = os.stat(directory).st_mtime
+        with self._lock:
+            row = self._db.execute('SELECT mtime FROM directories WHERE path = ?',
+                                   (directory,)).fetchone()
+        if row is not None and row[0] == mtime:
+            return
+
+        known = dict((r.path, r.mtime) for r in self.recordings()
+                     if in_directory(r.path, directory))
+        for entry in os.scandir(directory):
+            if not entry.is_file() or not recording.is_recording(entry.name):
+                continue
+            if known.pop(entry.path, None) != entry.stat().st_mtime:
+                self.add_file(entry.path)
+        for path in known:
+            self.remove(path)
+
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO directories (path, mtime) VALUES (?, ?)',
+                             (directory, mtime))
+
+    def watch(self, directory=acquisition.RECORD_DIR):
+        """Follow changes to `directory` with inotify, return False if unavailable."""
+        if self.watcher is not None and self.watcher.running:
+            return True
+        try:
+            self.watcher = watcher.CatalogWatcher(self, directory)
+        except OSError as e:
+            print('NOT WATCHING {}: {}'.format(directory, e))
+            self.watcher = None
+            return False
+        self.watcher.start()
+        return True
+
+    def refresh(self, directory=acquisition.RECORD_DIR):
+        """Bring the catalog up to date before it is listed.
+
+        Free while the watcher is running, otherwise a reconcile.
+        """
+        if self.watcher is None or not self.watcher.running:
+            self.reconcile(directory)
+
+_catalog = None
+
+
+def get_catalog():
+    """The catalog shared by the whole application."""
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog()
+        # Catch up with whatever changed while the app was not running,
+        # then follow the directory from here on
+        _catalog.reconcile()
+        _catalog.watch()
+    return _catalog
@@ -0,0 +1,316 @@
+import collections
+import concurrent.futures
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+import transfer
+
+GZIP_EXTENSION = '.gz'
+# Input bytes compressed by one worker at a time
+BLOCK_SIZE = 1024 * 1024
+# Deflate window, the tail of the previous block primes the next one
+WINDOW_SIZE = 32 * 1024
+LEVEL = 6
+# Bytes compressed and written to measure the two rates before choosing
+SAMPLE_SIZE = 8 * 1024 * 1024
+# Compress only if it is expected to take at most this share of a plain copy
+MIN_GAIN = 0.9
+
+GZIP = 'gzip'
+PLAIN = 'plain'
+
+# RFC 1952 member header: magic, deflate, FNAME flag, mtime, no extra flags, Unix
+GZIP_HEADER = struct.Struct('<BBBBIBB')
+GZIP_TRAILER = struct.Struct('<II')
+FNAME = 0x08
+
+
+def compress_block(data, dictionary, last, level=LEVEL):
+    """Raw deflate of one block, run in a worker process.
+
+    Blocks other than the last end on a sync flush, so the outputs simply
+    concatenate into one deflate stream, the way pigz does it.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY,
+                                      dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def gzip_header(name, mtime):
+    return GZIP_HEADER.pack(0x1f, 0x8b, 8, FNAME, int(mtime) & 0xffffffff, 0, 3) + \
+        os.fsencode(name) + b'\0'
+
+
+def _blocks(f, size):
+    """Yield (data, dictionary, last) for every block of an open file."""
+    previous = b''
+    data = f.read(size)
+    while True:
+        following = f.read(size) if data else b''
+        last = not following
+        yield data, previous[-WINDOW_SIZE:], last
+        if last:
+            return
+        previous, data = data, following
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class GzipExporter(object):
+    """Writes recordings as standard .gz files, compressing blocks on a process pool.
+
+    Blocks are submitted in order with a bounded number in flight and
+    written as they complete in order, so memory stays at a few blocks per
+    worker. The CRC-32 and size for the gzip trailer, and the checksum of
+    the compressed bytes for the manifest, are computed in this process.
+    """
+
+    def __init__(self, workers=None, level=LEVEL, block_size=BLOCK_SIZE):
+        self.workers = workers or default_workers()
+        self.level = level
+        self.block_size = block_size
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def compress_file(self, source, destination, progress=None, algorithm=transfer.SHA256,
+                      interval=transfer.PROGRESS_INTERVAL, limit=None, cancel=None, sync=True):
+        """Compress `source` into `destination`, return a Progress over the input.
+
+        The Progress's `checksum` is that of the compressed file and
+        `written` its size. `limit` stops after that many input bytes, for
+        sampling, and `sync` False skips the final fsync. Setting `cancel`
+        raises transfer.Cancelled between blocks.
+        """
+        total = os.path.getsize(source)
+        if limit is not None:
+            total = min(total, limit)
+        state = transfer.Progress(total, action='COMPRESSED')
+        state.method = GZIP
+        hasher = transfer.new_checksum(algorithm)
+        crc = 0
+        written = 0
+        pending = collections.deque()
+        last_report = state.started
+
+        def write(data):
+            nonlocal written
+            hasher.update(data)
+            dst.write(data)
+            written += len(data)
+
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            write(gzip_header(os.path.basename(source), os.path.getmtime(source)))
+            reader = src if limit is None else _Limited(src, limit)
+            done = 0
+            for data, dictionary, last in _blocks(reader, self.block_size):
+                if cancel is not None and cancel.is_set():
+                    for _, future in pending:
+                        future.cancel()
+                    raise transfer.Cancelled()
+                crc = zlib.crc32(data, crc)
+                pending.append((len(data), self.pool.submit(compress_block, data, dictionary,
+                                                            last, self.level)))
+                while len(pending) > 2 * self.workers or (last and pending):
+                    size, future = pending.popleft()
+                    write(future.result())
+                    done += size
+                    if progress is not None and time.monotonic() - last_report >= interval:
+                        state.update(done)
+                        progress(state)
+                        last_report = time.monotonic()
+            write(GZIP_TRAILER.pack(crc & 0xffffffff, done & 0xffffffff))
+            dst.flush()
+            if sync:
+                os.fsync(dst.fileno())
+
+        state.update(done)
+        state.checksum = hasher.hexdigest()
+        state.written = written
+        if progress is not None:
+            progress(state)
+        return state
+
+    def compression_rate(self, source, size=SAMPLE_SIZE, cancel=None):
+        """Input bytes per second the pool compresses, and the compressed/plain ratio.
+
+        The sample goes to /dev/null, so the rate does not include the bus.
+        """
+        self.pool  # start the workers outside the timed part
+        state = self.compress_file(source, os.devnull, limit=size, cancel=cancel, sync=False)
+        if state.done == 0:
+            return 0.0, 1.0
+        return state.rate, state.written / float(state.done)
+
+    def export(self, source, directory, name=None, algorithm=transfer.SHA256, progress=None,
+               uncached=True, cancel=None):
+        """Compress a recording onto the stick, verify it and add it to the manifest.
+
+        Like transfer.export_file(): returns the compression and
+        verification Progress objects and raises VerificationError if the
+        file read back from the stick differs. A cancelled or failed export
+        leaves neither file nor manifest entry behind.
+        """
+        name = (name or transfer.usb_file_name(source)) + GZIP_EXTENSION
+        destination = os.path.join(directory, name)
+        entries = transfer.read_manifest(directory)
+        if entries.pop(name, None) is not None:
+            transfer.write_manifest(directory, entries)
+        try:
+            copied = self.compress_file(source, destination, progress=progress,
+                                        algorithm=algorithm, cancel=cancel)
+            if uncached:
+                transfer.drop_cache(destination)
+            verified = transfer.checksum_file(destination, algorithm, progress=progress,
+                                              cancel=cancel)
+        except BaseException:
+            if os.path.exists(destination):
+                os.remove(destination)
+            raise
+        if verified.checksum != copied.checksum:
+            entries.pop(name, None)
+            transfer.write_manifest(directory, entries)
+            raise transfer.VerificationError('{} does not match what was written ({} {} != {})'.format(
+                destination, algorithm, verified.checksum, copied.checksum))
+        entries[name] = transfer.ManifestEntry(name, copied.written, os.path.getmtime(source),
+                                               algorithm, copied.checksum, copied.written)
+        transfer.write_manifest(directory, entries)
+        return copied, verified
+
+
+class _Limited(object):
+    """Reads at most `limit` bytes from a file."""
+
+    def __init__(self, f, limit):
+        self.f = f
+        self.left = limit
+
+    def read(self, size):
+        data = self.f.read(min(size, self.left))
+        self.left -= len(data)
+        return data
+
+
+def free_space(directory):
+    st = os.statvfs(directory)
+    return st.f_bavail * st.f_frsize
+
+
+def write_rate(directory, size=SAMPLE_SIZE, cancel=None):
+    """Bytes per second `directory`'s device takes, fsync included."""
+    block = os.urandom(1024 * 1024)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        started = time.monotonic()
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(max(1, size // len(block))):
+                if cancel is not None and cancel.is_set():
+                    raise transfer.Cancelled()
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        elapsed = time.monotonic() - started
+    finally:
+        os.remove(path)
+    return max(1, size // len(block)) * len(block) / elapsed
+
+
+def choose_method(source, directory, exporter, cancel=None):
+    """PLAIN or GZIP, whichever should get `source` onto the stick sooner.
+
+    A plain copy takes size / bus rate. Compressing takes the longer of
+    size / compression rate and compressed size / bus rate, since the pool
+    and the bus work at the same time. Measuring the bus writes a
+    SAMPLE_SIZE probe to the stick; with less than twice that free,
+    nothing is measured and PLAIN, what the export plan counted, is kept.
+    """
+    if free_space(directory) < 2 * SAMPLE_SIZE:
+        print('LOW SPACE ON {}, NOT MEASURING: PLAIN'.format(directory))
+        return PLAIN
+    bus = write_rate(directory, cancel=cancel)
+    rate, ratio = exporter.compression_rate(source, cancel=cancel)
+    size = os.path.getsize(source)
+    plain = size / bus
+    gzip = max(size / rate if rate else float('inf'), size * ratio / bus)
+    print('BUS {:.1f} MB/S, GZIP {:.1f} MB/S AT {:.0f}%: PLAIN {:.0f} S, GZIP {:.0f} S'.format(
+        bus / 1e6, rate / 1e6, 100 * ratio, plain, gzip))
+    return GZIP if gzip <= MIN_GAIN * plain else PLAIN
+
+
+def export(source, directory, method=None, algorithm=transfer.SHA256, progress=None,
+           max_part=None, cancel=None):
+    """Export one recording, compressed or not; `method` None decides by measuring.
+
+    A plain export larger than `max_part` is split into parts. Returns the
+    method used with the copy and verification Progress objects. Setting
+    `cancel` stops it with transfer.Cancelled.
+    """
+    with GzipExporter() as exporter:
+        if method is None:
+            method = choose_method(source, directory, exporter, cancel=cancel)
+        if method == GZIP:
+            return (method,) + exporter.export(source, directory, algorithm=algorithm,
+                                               progress=progress, cancel=cancel)
+    return (PLAIN,) + transfer.export_file(source, directory, algorithm=algorithm,
+                                           progress=progress, max_part=max_part, cancel=cancel)
+
+
+def benchmark(directory=None, source=None, size=64 * 1024 * 1024):
+    """Compress a CSV-like scratch file with 1 to N workers and check it with zlib."""
+    directory = directory or tempfile.gettempdir()
+    made = source is None
+    if made:
+        fd, source = tempfile.mkstemp(dir=directory, suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            t = 0.0
+            while f.tell() < size:
+                f.write('{:.6f},{:.4f},{:.4f},{:.4f},24.50,{:.3f},{:.3f},{:.3f}\n'.format(
+                    t, (t * 7) % 1, (t * 3) % 1, 1 - (t * 5) % 1, t % 3, (t * 11) % 2, t % 1))
+                t += 0.001
+    destination = os.path.join(directory, 'benchmark' + GZIP_EXTENSION)
+    try:
+        for workers in sorted(set([1, default_workers()])):
+            with GzipExporter(workers) as exporter:
+                exporter.pool
+                state = exporter.compress_file(source, destination)
+            with open(source, 'rb') as f, open(destination, 'rb') as g:
+                ok = zlib.decompress(g.read(), 16 + zlib.MAX_WBITS) == f.read()
+            print('{} workers: {:.1f} MB in {:.2f} s, {:.1f} MB/s, {:.0f}% of input, {}'.format(
+                workers, state.done / 1e6, state.elapsed, state.rate / 1e6,
+                100.0 * state.written / max(state.done, 1), 'valid gzip' if ok else 'CORRUPT'))
+        with GzipExporter() as exporter:
+            print('auto choice for {}: {}'.format(directory, choose_method(source, directory,
+                                                                           exporter)))
+    finally:
+        if made:
+            os.remove(source)
+        if os.path.exists(destination):
+            os.remove(destination)
+
+
+if __name__ == '__main__':
+    benchmark(*sys.argv[1:3])
@@ -0,0 +1,325 @@
+import os
+import re
+import select
+import socket
+import threading
+
+MOUNTINFO_PATH = '/proc/self/mountinfo'
+SYS_ROOT = '/sys'
+# udev's links from filesystem UUID to device node
+BY_UUID = '/dev/disk/by-uuid'
+# Seconds between sysfs checks when there is no netlink socket
+POLL_INTERVAL = 1.0
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast group the kernel sends its uevents to
+UEVENT_KERNEL_GROUP = 1
+
+OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(field):
+    """mountinfo writes space, tab, newline and backslash as \\ooo."""
+    return OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+class Mount(object):
+    """One line of /proc/<pid>/mountinfo, see proc(5)."""
+
+    def __init__(self, mount_id, parent_id, major, minor, root, mount_point, options,
+                 fstype, source, super_options):
+        self.mount_id = mount_id
+        self.parent_id = parent_id
+        self.major = major
+        self.minor = minor
+        self.root = root
+        self.mount_point = mount_point
+        self.options = options
+        self.fstype = fstype
+        self.source = source
+        self.super_options = super_options
+
+    @property
+    def dev(self):
+        return (self.major, self.minor)
+
+    @property
+    def read_only(self):
+        return 'ro' in self.options.split(',')
+
+
+def parse_mountinfo(text):
+    """Mounts described by the contents of a mountinfo file."""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        if '-' not in fields:
+            continue
+        separator = fields.index('-')
+        if separator < 6 or len(fields) < separator + 3:
+            continue
+        major, minor = fields[2].split(':')
+        mounts.append(Mount(int(fields[0]), int(fields[1]), int(major), int(minor),
+                            _unescape(fields[3]), _unescape(fields[4]), fields[5],
+                            fields[separator + 1], _unescape(fields[separator + 2]),
+                            fields[separator + 3] if len(fields) > separator + 3 else ''))
+    return mounts
+
+
+def parse_uevent(data):
+    """Action, devpath and key/value pairs of a kernel uevent datagram, or None."""
+    parts = data.split(b'\0')
+    header = parts[0].decode('utf-8', 'replace')
+    if '@' not in header:
+        return None  # sent by udevd, not the kernel
+    action, devpath = header.split('@', 1)
+    env = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b'=')
+        if sep:
+            env[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+    return action, devpath, env
+
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return default
+
+
+class BlockDevice(object):
+    """A disk or partition found under /sys/block."""
+
+    def __init__(self, name, sys_path, dev, size, usb, parent=None):
+        self.name = name
+        self.sys_path = sys_path
+        self.dev = dev
+        self.size = size
+        self.usb = usb
+        self.parent = parent
+        self.partitions = []
+        self.mount_point = None
+        self.fstype = None
+        self.uuid = None
+
+    @property
+    def node(self):
+        return '/dev/' + self.name
+
+
+def _dev_number(sys_path):
+    value = _read(os.path.join(sys_path, 'dev'))
+    if value is None or ':' not in value:
+        return None
+    major, minor = value.split(':')
+    return (int(major), int(minor))
+
+
+def scan_uuids(by_uuid=BY_UUID):
+    """Device name to filesystem UUID, from the udev symlinks."""
+    uuids = {}
+    try:
+        links = os.listdir(by_uuid)
+    except OSError:
+        return uuids
+    for uuid in links:
+        try:
+            target = os.readlink(os.path.join(by_uuid, uuid))
+        except OSError:
+            continue  # unplugged while listing
+        uuids[os.path.basename(target)] = uuid
+    return uuids
+
+
+def scan_block_devices(sys_root=SYS_ROOT):
+    """Disks and partitions under `sys_root`/block by name."""
+    table = {}
+    block = os.path.join(sys_root, 'block')
+    try:
+        disks = sorted(os.listdir(block))
+    except OSError:
+        return table
+    for name in disks:
+        path = os.path.join(block, name)
+        real = os.path.realpath(path)
+        disk = BlockDevice(name, path, _dev_number(path),
+                           512 * int(_read(os.path.join(path, 'size'), '0')),
+                           '/usb' in real)
+        table[name] = disk
+        try:
+            children = sorted(os.listdir(path))
+        except OSError:
+            continue
+        for child in children:
+            child_path = os.path.join(path, child)
+            if not os.path.exists(os.path.join(child_path, 'partition')):
+                continue
+            table[child] = BlockDevice(child, child_path, _dev_number(child_path),
+                                       512 * int(_read(os.path.join(child_path, 'size'), '0')),
+                                       disk.usb, parent=name)
+            disk.partitions.append(child)
+    return table
+
+
+class DeviceTracker(object):
+    """In-memory table of block devices, partitions and where they are mounted.
+
+    The table is rebuilt from sysfs and mountinfo only when something
+    changes: on a kernel uevent for a block device, or when mountinfo
+    reports a change through poll(). Without a netlink socket sysfs is
+    polled every POLL_INTERVAL instead. Lookups never touch the disk or
+    start a process.
+
+    `sys_root`, `mountinfo` and `by_uuid` can point at fixture files; with
+    watch=False nothing runs in the background and refresh() is explicit.
+    """
+
+    def __init__(self, sys_root=SYS_ROOT, mountinfo=MOUNTINFO_PATH, watch=True,
+                 interval=POLL_INTERVAL, by_uuid=BY_UUID):
+        self.sys_root = sys_root
+        self.mountinfo = mountinfo
+        self.by_uuid = by_uuid
+        self.interval = interval
+        self.devices = {}
+        self.mounts = []
+        self.version = 0
+        self.events = 0
+        self.error = None
+        self._changed = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+        self.refresh()
+        if watch:
+            self.start()
+
+    def refresh(self):
+        """Rebuild the table from sysfs and mountinfo."""
+        devices = scan_block_devices(self.sys_root)
+        mounts = parse_mountinfo(_read(self.mountinfo, ''))
+        for name, uuid in scan_uuids(self.by_uuid).items():
+            if name in devices:
+                devices[name].uuid = uuid
+        by_dev = dict((d.dev, d) for d in devices.values() if d.dev is not None)
+        for mount in mounts:
+            device = by_dev.get(mount.dev)
+            if device is not None and device.mount_point is None:
+                device.mount_point = mount.mount_point
+                device.fstype = mount.fstype
+        with self._changed:
+            self.devices = devices
+            self.mounts = mounts
+            self.version += 1
+            self._changed.notify_all()
+
+    def usb_disks(self):
+        return [d for d in self.devices.values() if d.usb and d.parent is None]
+
+    def usb_partitions(self):
+        """USB partitions, or whole USB disks that have no partition table."""
+        result = []
+        for disk in sorted(self.usb_disks(), key=lambda d: d.name):
+            if disk.partitions:
+                result.extend(self.devices[name] for name in disk.partitions
+                              if name in self.devices)
+            else:
+                result.append(disk)
+        return result
+
+    def usb_mounts(self):
+        """(device node, mount point) of every mounted USB partition."""
+        return [(d.node, d.mount_point) for d in self.usb_partitions() if d.mount_point]
+
+    def device_at(self, mount_point):
+        for device in self.devices.values():
+            if device.mount_point == mount_point:
+                return device
+        return None
+
+    def wait(self, version, timeout=None):
+        """Block until the table is newer than `version`, return the current version."""
+        with self._changed:
+            if self.version == version:
+                self._changed.wait(timeout)
+            return self.version
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='device-tracker')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _open_uevents(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, UEVENT_KERNEL_GROUP))
+        except (AttributeError, OSError) as e:
+            print('NO UEVENT SOCKET, POLLING SYSFS: {}'.format(e))
+            return None
+        return sock
+
+    def _sysfs_stamp(self):
+        block = os.path.join(self.sys_root, 'block')
+        try:
+            return os.stat(block).st_mtime, tuple(sorted(os.listdir(block)))
+        except OSError:
+            return None
+
+    def _run(self):
+        sock = self._open_uevents()
+        poller = select.poll()
+        try:
+            mountinfo = open(self.mountinfo)
+        except (IOError, OSError):
+            mountinfo = None
+        else:
+            # mountinfo signals a changed mount table with POLLPRI
+            poller.register(mountinfo, select.POLLPRI | select.POLLERR)
+        if sock is not None:
+            poller.register(sock, select.POLLIN)
+        stamp = self._sysfs_stamp()
+        try:
+            while not self._stop.is_set():
+                changed = False
+                for fd, _ in poller.poll(self.interval * 1000):
+                    if sock is not None and fd == sock.fileno():
+                        event = parse_uevent(sock.recv(8192))
+                        if event is not None and event[2].get('SUBSYSTEM') == 'block':
+                            self.events += 1
+                            changed = True
+                    elif mountinfo is not None and fd == mountinfo.fileno():
+                        mountinfo.seek(0)
+                        mountinfo.read()
+                        changed = True
+                if sock is None:
+                    current = self._sysfs_stamp()
+                    changed = changed or current != stamp
+                    stamp = current
+                if changed:
+                    self.refresh()
+        except Exception as e:
+            self.error = e
+        finally:
+            if sock is not None:
+                sock.close()
+            if mountinfo is not None:
+                mountinfo.close()
+
+
+_tracker = None
+
+
+def get_tracker():
+    """The device tracker shared by the whole application."""
+    global _tracker
+    if _tracker is None:
+        _tracker = DeviceTracker()
+    return _tracker
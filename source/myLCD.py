@@ -14,6 +14,7 @@ import feedparser
 ##Scheduling
 import schedule
 import time
+import threading
 
 ## Raspberry libraries
 import RPi.GPIO as GPIO
@@ -35,6 +36,7 @@ import os.path
 
 GPIO_PIN_RS = 26
 GPIO_PIN_RW = None ## Raspberry Pi cannot handle if the display writes data. Could damage RPi. This pin on the LCD was connected to gound.
+LCD_BUSY_FLAG = False ## Read the busy flag instead of waiting fixed delays. Needs GPIO_PIN_RW wired and level shifters on D4-D7, the display drives them at 5V when read.
 GPIO_PIN_E_TOP = 19
 GPIO_PIN_E_BOTTOM = 21
 GPIO_PIN_D4 = 13
@@ -48,12 +50,45 @@ LCD_DOT_SIZE = 8
 LCD_BRIGHTNESS = 0 # to be used with PWM for control of the LCD brightness.
 
 ### Initialize the LCD
-lcd_top = CharLCD(pin_rs=GPIO_PIN_RS, pin_rw=GPIO_PIN_RW,  pin_e=GPIO_PIN_E_TOP, pins_data=[GPIO_PIN_D4, GPIO_PIN_D5, GPIO_PIN_D6, GPIO_PIN_D7], numbering_mode=GPIO.BCM, cols=LCD_COLUMNS, rows=LCD_ROWS, dotsize=LCD_DOT_SIZE)
-lcd_bottom = CharLCD(pin_rs=GPIO_PIN_RS, pin_rw=GPIO_PIN_RW, pin_e=GPIO_PIN_E_BOTTOM, pins_data=[GPIO_PIN_D4, GPIO_PIN_D5, GPIO_PIN_D6, GPIO_PIN_D7], numbering_mode=GPIO.BCM, cols=LCD_COLUMNS, rows=LCD_ROWS, dotsize=LCD_DOT_SIZE)
+lcd_top = CharLCD(pin_rs=GPIO_PIN_RS, pin_rw=GPIO_PIN_RW,  pin_e=GPIO_PIN_E_TOP, pins_data=[GPIO_PIN_D4, GPIO_PIN_D5, GPIO_PIN_D6, GPIO_PIN_D7], numbering_mode=GPIO.BCM, cols=LCD_COLUMNS, rows=LCD_ROWS, dotsize=LCD_DOT_SIZE, busy_flag=LCD_BUSY_FLAG)
+lcd_bottom = CharLCD(pin_rs=GPIO_PIN_RS, pin_rw=GPIO_PIN_RW, pin_e=GPIO_PIN_E_BOTTOM, pins_data=[GPIO_PIN_D4, GPIO_PIN_D5, GPIO_PIN_D6, GPIO_PIN_D7], numbering_mode=GPIO.BCM, cols=LCD_COLUMNS, rows=LCD_ROWS, dotsize=LCD_DOT_SIZE, busy_flag=LCD_BUSY_FLAG)
 
 var = 1
 i = 0
 
+### Frame buffer
+### Callers compose the 40x4 frame with setLine() and flush() hands it to the render thread, which
+### sends only what differs from what is on the display: one DDRAM address command per run of
+### changed characters, and none at all when the controller's cursor is already there. Both hold
+### encoded bytes, row 0-3. Only the render thread drives the controllers, so no caller ever waits
+### on the bus.
+LCD_LINES = 4
+BLANK = 0x20
+# Unchanged characters between two changes are rewritten if there are at most this many,
+# an address command costs as much bus time as a character
+MAX_GAP = 1
+
+clock = getattr(time, 'monotonic', time.time)
+
+frame = [[BLANK] * LCD_COLUMNS for _ in range(LCD_LINES)]
+shown = [[BLANK] * LCD_COLUMNS for _ in range(LCD_LINES)] # both controllers are cleared at init
+# bus operations of the last render, and what rewriting the rows it was asked for would have cost
+last_flush = {'commands': 0, 'data': 0, 'full': 0}
+totals = {'flushes': 0, 'commands': 0, 'data': 0, 'full': 0}
+
+### Render queue
+### Lines set but not rendered yet, by line number. A line set again before the render thread got to
+### it replaces the waiting one, latest wins, so a slow bus never builds a backlog.
+render_lock = threading.Condition()
+pending = {}
+pending_since = None # when the oldest waiting line was set
+flush_requested = 0 # number of the last flush() call
+flush_rendered = 0 # number of the last flush() whose lines are on the display
+# queued: lines set, collapsed: of those replaced before rendering, depth: lines waiting now,
+# latency: seconds from the oldest waiting line being set to it being on the display
+metrics = {'queued': 0, 'collapsed': 0, 'renders': 0, 'depth': 0, 'max_depth': 0,
+	'latency': 0.0, 'max_latency': 0.0, 'total_latency': 0.0}
+
 
 ### Functions for getting time
 def getTime():
@@ -62,21 +97,116 @@ def getTime():
     printLine(0, t.rjust(40))
     return t.rjust(40)
 
+def setTime():
+    "Puts the current time and date on the 1st row of the next frame"
+    t=strftime("%A %Y-%m-%d %H:%M")
+    setLine(0, t.rjust(40))
+    return t.rjust(40)
+
 ### LCD Functions
+def controller(lineNr):
+	"LCD and its row for line 0-3 of the display"
+	if lineNr==0 or lineNr==1:
+		return lcd_top, lineNr
+	return lcd_bottom, lineNr-2
+
+def setLine(lineNr, str):
+	"Puts str on line lineNr, 0-3, of the next frame, padded with spaces or cropped to 40 char. Nothing is sent until flush()"
+	global pending_since
+	encoded=[b for b in lcd_top.codec.encode(str) if b >= 0] # drop \r and \n
+	encoded=(encoded+[BLANK]*LCD_COLUMNS)[:LCD_COLUMNS]
+	with render_lock:
+		frame[lineNr]=encoded
+		if lineNr in pending:
+			metrics['collapsed']+=1
+		elif not pending:
+			pending_since=clock()
+		pending[lineNr]=encoded
+		metrics['queued']+=1
+		metrics['depth']=len(pending)
+		metrics['max_depth']=max(metrics['max_depth'], len(pending))
+
+def changedRuns(old, new):
+	"[start, end) column ranges where new differs from old, close runs merged"
+	runs=[]
+	for col in range(len(new)):
+		if old[col]!=new[col]:
+			if runs and col-runs[-1][1]<=MAX_GAP:
+				runs[-1][1]=col+1
+			else:
+				runs.append([col, col+1])
+	return runs
+
+def flush(wait=False):
+	"Hands the lines set so far to the render thread, with wait=True returns once they are on the display"
+	global flush_requested
+	with render_lock:
+		flush_requested+=1
+		target=flush_requested
+		render_lock.notify_all()
+		while wait and flush_rendered<target:
+			render_lock.wait()
+
+def render(lines):
+	"Sends the difference between lines, lineNr to encoded line, and the display, returns the bus operations used"
+	commands=0
+	data=0
+	for lineNr in sorted(lines):
+		line=lines[lineNr]
+		lcd, row=controller(lineNr)
+		for start, end in changedRuns(shown[lineNr], line):
+			# the address command is left out when the controller's cursor is there already
+			commands+=lcd.write_at((row, start), line[start:end])
+			data+=end-start
+			shown[lineNr][start:end]=line[start:end]
+	last_flush['commands']=commands
+	last_flush['data']=data
+	last_flush['full']=len(lines)*(1+LCD_COLUMNS) # one address command and 40 char per line
+	totals['flushes']+=1
+	for key in ('commands', 'data', 'full'):
+		totals[key]+=last_flush[key]
+	return commands+data
+
+def renderLoop():
+	"Render thread: waits for flush(), takes whatever lines are waiting and renders them"
+	global pending, pending_since, flush_rendered
+	while True:
+		with render_lock:
+			while flush_rendered==flush_requested:
+				render_lock.wait()
+			lines, since, taken=pending, pending_since, flush_requested
+			pending, pending_since={}, None
+			metrics['depth']=0
+		if lines:
+			try:
+				render(lines)
+			except Exception as e:
+				print("LCD render failed: {}".format(e))
+			latency=clock()-since
+			metrics['renders']+=1
+			metrics['latency']=latency
+			metrics['max_latency']=max(metrics['max_latency'], latency)
+			metrics['total_latency']+=latency
+		with render_lock:
+			flush_rendered=taken
+			render_lock.notify_all()
+
+def renderMetrics():
+	"Copy of the render queue metrics, with the mean latency"
+	with render_lock:
+		result=dict(metrics)
+		result['depth']=len(pending)
+	result['mean_latency']=result['total_latency']/result['renders'] if result['renders'] else 0.0
+	return result
+
+renderer = threading.Thread(target=renderLoop, name='lcd-render')
+renderer.daemon = True
+renderer.start()
+
 def printLine( lineNr, str):
-	#Add spaces for automatic clearing of LCD
-	str+="                                            "
 	"Prints one line on LCD, lineNR, 0-3 is LCD Row and str is string to be printed, max 40 char (will be cropped if longer)"
-	str=str[:40] #Crop string to first 40 char
-	# If lineNr 0 or 1, top LCD
-	if lineNr==0 or lineNr==1:
-		lcd_top.cursor_pos=(lineNr,0)
-		lcd_top.write_string(str)
-	# If lineNr 2 or 3, bottom LCD
-	elif lineNr==2 or lineNr==3:
-		lineNr-=2 #Still called as row 0,1 to lcd...
-		lcd_bottom.cursor_pos=(lineNr,0)
-		lcd_bottom.write_string(str)
+	setLine(lineNr, str)
+	flush()
 	return
 
 def clearLine(lineNr):
@@ -84,10 +214,11 @@ def clearLine(lineNr):
 	return
 
 def updateLCD(str2="", str3="", str4=""):
-	getTime()
-	printLine(1, str2)
-	printLine(2, str3)
-	printLine(3, str4)
+	setTime()
+	setLine(1, str2)
+	setLine(2, str3)
+	setLine(3, str4)
+	flush()
 	#print "LCD update"	
 
 ## Shutdown management
@@ -97,13 +228,15 @@ def shutdown_message():
         printLine(1,13*' '+"Shutting down")
 	printLine(2,5*' '+"Re-plug power cable to restart")
         printLine(3,40*'-')
+	flush(wait=True)
 	# Terminate LCD program
 	quit()
 	
 def clear_all(top=False):
 	if top:
-		clearLine(0)
-	clearLine(1)
-	clearLine(2)
-	clearLine(3)
+		setLine(0, "")
+	setLine(1, "")
+	setLine(2, "")
+	setLine(3, "")
+	flush()
 	
@@ -0,0 +1,180 @@
+import os
+
+import recording
+
+# Largest file FAT12/16/32 can hold
+FAT_MAX_FILE = 4 * 1024 ** 3 - 1
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def part_name(name, number):
+    """mpu6050_..._10h11m12s.csv -> mpu6050_..._10h11m12s_part01.csv"""
+    stem, extension = os.path.splitext(name)
+    return '{}_part{:02d}{}'.format(stem, number, extension)
+
+
+def part_overhead(path):
+    """Bytes every part repeats: the header of its format."""
+    if recording.is_compressed(path):
+        return recording.HEADER_SIZE + recording.TRAILER_STRUCT.size
+    if recording.is_binary(path):
+        return recording.HEADER_SIZE
+    return len(recording.CSV_HEADER)
+
+
+def count_parts(path, size, max_part=FAT_MAX_FILE):
+    """Parts a recording of `size` bytes is split into, from its size alone."""
+    if size <= max_part:
+        return 1
+    room = max_part - part_overhead(path)
+    if recording.is_compressed(path):
+        room -= room // 1000  # block index, roughly
+    return -(-size // room)
+
+
+def split(source, max_part, new_part, progress=None):
+    """Write `source` as parts of at most `max_part` bytes in one sequential pass.
+
+    Parts end on a record boundary: a CSV row, a binary record or a
+    compressed block, and each starts with its own header so it can be
+    read on its own. `new_part(number)` is called for parts 1, 2, ... and
+    returns a file-like object to write the part to; it is closed when the
+    part is complete. `progress(done)` is called with the source bytes
+    consumed so far. Returns the number of parts.
+    """
+    with open(source, 'rb') as src:
+        if recording.is_compressed(source):
+            return _split_compressed(source, src, max_part, new_part, progress)
+        if recording.is_binary(source):
+            return _split_binary(src, max_part, new_part, progress)
+        return _split_csv(src, max_part, new_part, progress)
+
+
+def _split_csv(src, max_part, new_part, progress):
+    first = src.readline()
+    # the recorder writes a header row, the Java tool may not
+    header = first if first[:1].isalpha() else b''
+    pending = b'' if header else first
+    done = len(first)
+    count = 0
+    part = None
+    size = 0
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        data = pending + chunk
+        if chunk:
+            cut = data.rfind(b'\n') + 1
+            rows, pending = data[:cut], data[cut:]
+        else:
+            rows, pending = data, b''  # last row may lack its newline
+        while rows:
+            if part is None:
+                count += 1
+                part = new_part(count)
+                part.write(header)
+                size = len(header)
+            room = max_part - size
+            if len(rows) <= room:
+                part.write(rows)
+                size += len(rows)
+                break
+            cut = rows.rfind(b'\n', 0, room) + 1
+            if cut == 0 and size == len(header):
+                raise ValueError('CSV row longer than {} bytes'.format(max_part))
+            part.write(rows[:cut])
+            part.close()
+            part = None
+            rows = rows[cut:]
+        done += len(chunk)
+        if progress is not None:
+            progress(done)
+        if not chunk:
+            break
+    if part is not None:
+        part.close()
+    return count
+
+
+def _split_binary(src, max_part, new_part, progress):
+    header = recording.Header.unpack(src.read(recording.HEADER_SIZE))
+    record_size = header.record_size
+    src.seek(0, os.SEEK_END)
+    total = (src.tell() - recording.HEADER_SIZE) // record_size
+    src.seek(recording.HEADER_SIZE)
+    per_part = (max_part - recording.HEADER_SIZE) // record_size
+    if per_part < 1:
+        raise ValueError('Parts of {} bytes cannot hold a record'.format(max_part))
+    per_chunk = max(1, CHUNK_SIZE // record_size)
+
+    first = 0
+    count = 0
+    while first < total or count == 0:
+        samples = min(per_part, total - first)
+        count += 1
+        part_header = recording.Header(header.sample_rate,
+                                       header.start_time + first / float(header.sample_rate),
+                                       header.accel_scale, header.gyro_scale, header.channels,
+                                       header.lost if first == 0 else 0, samples)
+        part = new_part(count)
+        part.write(part_header.pack())
+        left = samples
+        while left:
+            data = src.read(min(left, per_chunk) * record_size)
+            if not data:
+                break
+            part.write(data)
+            left -= len(data) // record_size
+            if progress is not None:
+                progress(src.tell())
+        part.close()
+        first += samples
+    return count
+
+
+def _split_compressed(source, src, max_part, new_part, progress):
+    reader = recording.BlockReader(source)
+    fixed = recording.HEADER_SIZE + recording.TRAILER_STRUCT.size
+    per_block = recording.BLOCK_STRUCT.size + recording.INDEX_STRUCT.size
+
+    groups = []
+    group = []
+    size = fixed
+    for entry in reader.index:
+        if group and size + per_block + entry.size > max_part:
+            groups.append(group)
+            group = []
+            size = fixed
+        if fixed + per_block + entry.size > max_part:
+            raise ValueError('Compressed block larger than {} bytes'.format(max_part))
+        group.append(entry)
+        size += per_block + entry.size
+    groups.append(group)
+
+    for count, group in enumerate(groups, 1):
+        base = group[0].first_sample if group else 0
+        header = recording.Header(reader.header.sample_rate,
+                                  group[0].timestamp if group else reader.start_time,
+                                  reader.header.accel_scale, reader.header.gyro_scale,
+                                  reader.header.channels,
+                                  reader.header.lost if count == 1 else 0,
+                                  sum(entry.samples for entry in group))
+        part = new_part(count)
+        part.write(header.pack())
+        offset = recording.HEADER_SIZE
+        index = []
+        for entry in group:
+            src.seek(entry.offset + recording.BLOCK_STRUCT.size)
+            data = src.read(entry.size)
+            part.write(recording.BLOCK_STRUCT.pack(entry.size, entry.samples,
+                                                   entry.first_sample - base, entry.timestamp))
+            part.write(data)
+            index.append(recording.INDEX_STRUCT.pack(offset, entry.size, entry.samples,
+                                                     entry.first_sample - base, entry.timestamp))
+            offset += recording.BLOCK_STRUCT.size + entry.size
+            if progress is not None:
+                progress(src.tell())
+        part.write(b''.join(index))
+        part.write(recording.TRAILER_STRUCT.pack(offset, len(index), reader.codec,
+                                                 recording.TRAILER_MAGIC))
+        part.close()
+    return len(groups)
@@ -0,0 +1,172 @@
+import os
+import zlib
+
+import compression
+import parts
+import transfer
+
+FAT_MAX_FILE = parts.FAT_MAX_FILE
+FAT_FILESYSTEMS = ('vfat', 'msdos', 'fat')
+# Kept free on the stick for the manifest and directory entries
+MARGIN_BYTES = 1024 * 1024
+
+# How well a recording compresses is measured on this many slices of this
+# many bytes, spread evenly over the file
+SAMPLE_SLICES = 8
+SAMPLE_SLICE = 128 * 1024
+# Added to the measured ratio: the rest of the file may compress worse
+RATIO_MARGIN = 0.1
+# Worst case growth of incompressible data in deflate stored blocks
+DEFLATE_OVERHEAD = 5.0 / 16384
+
+NO_SPACE = 'NOT ENOUGH SPACE'
+TOO_LARGE = 'FILE OVER 4 GB'
+
+
+def sample_ratio(path, size, slices=SAMPLE_SLICES, slice_size=SAMPLE_SLICE):
+    """Compressed/plain ratio of slices spread over a recording.
+
+    Each slice is compressed on its own at the export's level, which comes
+    out a little worse than the export's continuous stream.
+    """
+    plain = packed = 0
+    with open(path, 'rb') as f:
+        for i in range(slices):
+            f.seek(size * i // slices)
+            data = f.read(slice_size)
+            plain += len(data)
+            packed += len(zlib.compress(data, compression.LEVEL))
+    return packed / float(plain) if plain else 1.0
+
+
+def predicted_size(path, size, method, ratio=sample_ratio):
+    """Bytes `method` writes to the stick for a recording, with a margin.
+
+    For gzip that is the ratio measured on a sample of the file plus
+    RATIO_MARGIN, never more than what deflate writes for data that does
+    not compress at all.
+    """
+    if method != compression.GZIP:
+        return size
+    bound = int(size * (1 + DEFLATE_OVERHEAD)) + 64 * 1024
+    try:
+        measured = ratio(path, size)
+    except (IOError, OSError):
+        return bound
+    return min(bound, int(size * (measured + RATIO_MARGIN)) + 64 * 1024)
+
+
+def round_up(size, cluster):
+    return -(-size // cluster) * cluster if cluster else size
+
+
+class PlannedFile(object):
+
+    def __init__(self, path, size, method, predicted, needed, parts=1):
+        self.path = path
+        self.size = size
+        self.method = method
+        self.predicted = predicted
+        self.needed = needed
+        self.parts = parts
+
+
+class Plan(object):
+    """What will be written, what was left out and why, and the space figures."""
+
+    def __init__(self, free, cluster, max_file):
+        self.free = free
+        self.cluster = cluster
+        self.max_file = max_file
+        self.files = []
+        self.refused = []  # (path, reason)
+        self.up_to_date = []
+        self.replanned = []
+
+    @property
+    def needed(self):
+        return sum(f.needed for f in self.files)
+
+    @property
+    def ok(self):
+        return not self.refused
+
+    def summary(self):
+        if self.refused:
+            path, reason = self.refused[0]
+            return '{}: {}'.format(reason, os.path.basename(path))
+        return '{:.1f} OF {:.1f} MB FREE'.format(self.needed / 1e6, self.free / 1e6)
+
+
+def plan_export(recordings, directory, method=None, fstype=None, entries=None,
+                replan=True, statvfs=os.statvfs, ratio=sample_ratio):
+    """Decide, before writing anything, whether `recordings` fit on the stick.
+
+    `recordings` are catalog entries (anything with path and size), so no
+    file is opened for a plain export; the only system call is one
+    statvfs. Where gzip has to be considered a sample of the file is
+    compressed to measure its ratio, see predicted_size(). `method` is the
+    export format, None for automatic. On FAT a plain export over 4 GiB
+    is planned as parts, each repeating the format's header; a gzip file
+    over 4 GiB is refused. A file beyond the free space is refused,
+    unless a gzip export of it would fit and `replan` allows it, in which
+    case it is re-planned as gzip. `entries` is the stick's manifest: files it lists as complete
+    need no space and interrupted ones only the rest. Files are taken
+    oldest first, as given.
+    """
+    st = statvfs(directory)
+    free = st.f_bavail * st.f_frsize - MARGIN_BYTES
+    fat = fstype in FAT_FILESYSTEMS
+    plan = Plan(max(free, 0), st.f_frsize, FAT_MAX_FILE if fat else None)
+    entries = entries or {}
+    left = plan.free
+
+    for recording in recordings:
+        path, size = recording.path, recording.size
+        name = transfer.usb_file_name(path)
+        entry = entries.get(name)
+        first_part = entries.get(parts.part_name(name, 1))
+        if ((entry is not None and entry.complete and entry.size == size) or
+                (first_part is not None and first_part.complete and
+                 first_part.mtime == getattr(recording, 'mtime', None))):
+            plan.up_to_date.append(path)
+            continue
+        done = entry.offset if entry is not None and not entry.complete else 0
+
+        if method == compression.GZIP:
+            choices = [compression.GZIP]
+        elif replan:
+            choices = [compression.PLAIN, compression.GZIP]
+        else:
+            choices = [compression.PLAIN]
+        chosen = reason = None
+        for choice in choices:
+            predicted = predicted_size(path, size, choice, ratio)
+            count = 1
+            if plan.max_file is not None and predicted > plan.max_file:
+                if choice != compression.PLAIN:
+                    reason = reason or TOO_LARGE
+                    continue
+                count = parts.count_parts(path, size, plan.max_file)
+                predicted += count * parts.part_overhead(path)
+                done = 0  # split exports are not resumed
+            # every file, every part, wastes up to a cluster
+            needed = round_up(predicted - (done if choice == compression.PLAIN else 0),
+                              st.f_frsize) + (count - 1) * st.f_frsize
+            if needed > left:
+                reason = reason or NO_SPACE
+            else:
+                chosen = PlannedFile(path, size, choice, predicted, needed, count)
+                break
+        if chosen is None:
+            plan.refused.append((path, reason))
+            continue
+        if method == compression.PLAIN and chosen.method != compression.PLAIN:
+            plan.replanned.append(path)
+        elif method is None and chosen.method == compression.PLAIN:
+            chosen.method = None  # still measured when exported
+        elif method is None:
+            plan.replanned.append(path)
+        left -= chosen.needed
+        plan.files.append(chosen)
+    return plan
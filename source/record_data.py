@@ -1,6 +1,6 @@
 from time import time
 from time import sleep
-import datetime 
+import datetime
 from Adafruit_CharLCD import Adafruit_CharLCD
 import csv
 import cutie
@@ -8,6 +8,22 @@ import os
 import signal
 import subprocess
 import myLCD
+import acquisition
+import catalog
+import recording
+import sensor
+import storage
+
+SENSOR_OPTIONS = ['MPU6050 1KHZ (FIFO)', 'MPU6050 100HZ', 'BANNER QM42 (JAVA)']
+MPU6050_MODES = {
+    0: (1000, acquisition.FIFO),
+    1: (100, acquisition.POLLED),
+}
+# Long recordings are split so the storage manager can evict old parts
+SEGMENT_SECONDS = 600
+FORMAT_OPTIONS = ['COMPRESSED (.MPZ)', 'BINARY (.MPU)', 'CSV']
+FORMAT_EXTENSIONS = [recording.COMPRESSED_EXTENSION, recording.BINARY_EXTENSION,
+                     recording.CSV_EXTENSION]
 
 def record_data():
     # lcd = Adafruit_CharLCD()
@@ -20,34 +36,50 @@ def record_data():
     myLCD.printLine(1, 'ENTER DURATION:')
     hours = cutie.get_number_arrows('HOURS', 1, 13, 0)
     if hours == -1:
-    	return
+        return
     minutes = cutie.get_number_arrows('MIN', 1, 60, 0)
     if minutes == -1:
-    	return
+        return
 
     if minutes+hours == 0:
-    	#lcd.clear()
-    	#lcd.message('NO TIME ENTERED')
+        #lcd.clear()
+        #lcd.message('NO TIME ENTERED')
         myLCD.updateLCD(str2 = 'NO TIME ENTERED')
-    	print('NO TIME ENTERED')
-    	sleep(1)
-    	return
+        print('NO TIME ENTERED')
+        sleep(1)
+        return
 
     endTime = time() + (3600 * float(hours)) + (60 * float(minutes))
 
-    # check if sensor is attached via /dev/ttyUSB0
-    sensor_connected = os.path.exists('/dev/ttyUSB0')
-    while not sensor_connected:
-        #lcd.clear()
-        #lcd.message('NO SENSOR FOUND')
-        myLCD.updateLCD(str2 = 'NO SENSOR FOUND')
-        print('NO SENSOR FOUND')
-        sleep(1)
-        options = ['RETRY SENSOR PAIRING']
-        selected_option = cutie.select(options, selected_index=0)
-        if selected_option == -1:
+    myLCD.clear_all()
+    myLCD.printLine(1, 'SELECT SENSOR:')
+    selected_sensor = cutie.select(SENSOR_OPTIONS, selected_index=0)
+    if selected_sensor == -1:
+        return
+
+    if selected_sensor in MPU6050_MODES:
+        myLCD.clear_all()
+        myLCD.printLine(1, 'SELECT FORMAT:')
+        selected_format = cutie.select(FORMAT_OPTIONS, selected_index=0)
+        if selected_format == -1:
+            return
+        mpu = _connect_mpu6050()
+        if mpu is None:
             return # back to main menu
+    else:
+        # check if sensor is attached via /dev/ttyUSB0
         sensor_connected = os.path.exists('/dev/ttyUSB0')
+        while not sensor_connected:
+            #lcd.clear()
+            #lcd.message('NO SENSOR FOUND')
+            myLCD.updateLCD(str2 = 'NO SENSOR FOUND')
+            print('NO SENSOR FOUND')
+            sleep(1)
+            options = ['RETRY SENSOR PAIRING']
+            selected_option = cutie.select(options, selected_index=0)
+            if selected_option == -1:
+                return # back to main menu
+            sensor_connected = os.path.exists('/dev/ttyUSB0')
 
     myLCD.updateLCD(str2='ENTER TO START')
     button_pressed = None
@@ -63,13 +95,83 @@ def record_data():
         sleep(1)
         return
 
-    # calculate the finish time after the user confirms the start 
+    # calculate the finish time after the user confirms the start
     curTime = time()
     finish = datetime.datetime.fromtimestamp(endTime)
 
     myLCD.updateLCD(str2='RECORDING...', str3='FINISH: {:02d}:{:02d}'.format(finish.hour, finish.minute))
     print('FINISH: {:02d}:{:02d}\nRECORDING...'.format(finish.hour, finish.minute))
- 
+
+    if selected_sensor in MPU6050_MODES:
+        rate, mode = MPU6050_MODES[selected_sensor]
+        path = acquisition.recording_path(extension=FORMAT_EXTENSIONS[selected_format])
+        recorder = _record_mpu6050(mpu, path, endTime, rate, mode)
+        myLCD.updateLCD(str2='DONE', str3='{} SAMPLES {:.0f}/S'.format(recorder.written, recorder.achieved_rate),
+                        str4='LOST: {}'.format(recorder.lost + recorder.buffer.dropped)
+                             if recorder.lost or recorder.buffer.dropped else '')
+        sleep(2)
+    else:
+        _record_qm42(endTime)
+        #lcd.message('\nDONE')
+        myLCD.updateLCD(str2='DONE')
+        sleep(1)
+    print('DONE')
+
+def _connect_mpu6050():
+    while True:
+        try:
+            mpu = sensor.open_sensor()
+            if mpu.probe():
+                return mpu
+        except (ImportError, IOError, OSError) as e:
+            print(e)
+        myLCD.updateLCD(str2 = 'NO SENSOR FOUND')
+        print('NO SENSOR FOUND')
+        sleep(1)
+        options = ['RETRY SENSOR CONNECTION']
+        selected_option = cutie.select(options, selected_index=0)
+        if selected_option == -1:
+            return None
+
+def _record_mpu6050(mpu, path, endTime, rate, mode):
+    recordings = catalog.get_catalog()
+    manager = storage.get_manager()
+
+    def segment_closed(path, header):
+        recordings.close_recording(path, header)
+        manager.add(path)
+
+    recorder = acquisition.Recorder(mpu, path, rate=rate, mode=mode,
+                                    segment_seconds=SEGMENT_SECONDS,
+                                    on_open=recordings.open_recording, on_segment=segment_closed)
+    recorder.start()
+    manager.start()
+    print('RECORDING TO {}'.format(recorder.path))
+
+    while recorder.running:
+        myLCD.getTime()
+        # only read the recorder's counters here, sampling runs on its own threads
+        myLCD.printLine(3, 'SAMPLES: {} BUFFER: {:.0f}%'.format(recorder.written, 100 * recorder.buffer.fill))
+        button_pressed = cutie.wait_for_button()
+        if (time() >= endTime) or button_pressed == 'red':
+            break
+
+    recorder.stop()
+    manager.stop()
+    if manager.evicted:
+        print('DELETED {} OLD RECORDINGS FOR SPACE'.format(len(manager.evicted)))
+    if recorder.error is not None:
+        print('SENSOR ERROR: {}'.format(recorder.error))
+        myLCD.updateLCD(str2='SENSOR ERROR')
+        sleep(1)
+    print('{} SAMPLES ({:.1f}/s), {} FIFO OVERFLOWS, {} LOST'.format(
+        recorder.written, recorder.achieved_rate, recorder.overflows, recorder.lost))
+    print('BUFFER: {} OF {} RECORDS HIGH WATER, {} OVERRUNS, {} DROPPED'.format(
+        recorder.buffer.high_water, recorder.buffer.capacity,
+        recorder.buffer.overruns, recorder.buffer.dropped))
+    return recorder
+
+def _record_qm42(endTime):
     # excute following script: java -jar ~/BannerQM42TestApplication.jar -config 1000RPM-5Hz_1Device.JSON -logfile test.csv -port /dev/ttyUSB0
     os.chdir('/home/pi')
     cmd = 'java -jar BannerQM42TestApplication.jar -config 1000RPM-5Hz_1Device.JSON -logfile {}.csv -port /dev/ttyUSB0'
@@ -84,19 +186,10 @@ def record_data():
         button_pressed = cutie.wait_for_button()
         if (time() >= endTime) or button_pressed == 'red':
             break
-        elif button_pressed == 'red':
-            myLCD.updateLCD(str2='CANCELING...')
-            os.killpg(os.getpgid(pro.pid), signal.SIGTERM)
-            os.chdir('/home/pi/accelerometer_raspi/source')
-            sleep(1)
-            return
 
     os.killpg(os.getpgid(pro.pid), signal.SIGTERM)
 
     os.chdir('/home/pi/accelerometer_raspi/source')
 
-    #lcd.message('\nDONE')
-    myLCD.updateLCD(str2='DONE')
-    sleep(1)
-    print('DONE')
-
+    # pick up the CSV the Java tool wrote
+    catalog.get_catalog().refresh()
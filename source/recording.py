@@ -0,0 +1,415 @@
+import bisect
+import fnmatch
+import lzma
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import sensor
+
+# File name patterns of everything the recorder or the Java tool writes
+CSV_EXTENSION = '.csv'
+BINARY_EXTENSION = '.mpu'
+COMPRESSED_EXTENSION = '.mpz'
+RECORDING_PATTERNS = ('*' + CSV_EXTENSION, '*' + BINARY_EXTENSION, '*' + COMPRESSED_EXTENSION)
+
+CSV_HEADER = 'time,ax_g,ay_g,az_g,temp_c,gx_dps,gy_dps,gz_dps\n'
+CSV_ROW = '{:.6f},{:.4f},{:.4f},{:.4f},{:.2f},{:.3f},{:.3f},{:.3f}\n'
+
+# Binary recording layout:
+#
+#   header   HEADER_SIZE bytes, little-endian fields below, then the channel
+#            layout as 'name:dtype,...' padded with NULs
+#   records  fixed-size records exactly as the MPU6050 returns them
+#            (ACCEL_XOUT_H .. GYRO_ZOUT_L, big-endian int16)
+#
+# Sample i was taken at start_time + i / sample_rate.
+MAGIC = b'MPU6050\x00'
+VERSION = 1
+HEADER_SIZE = 128
+HEADER_STRUCT = struct.Struct('<8sHHHHddffIQ')
+CHANNELS = (('ax', '>i2'), ('ay', '>i2'), ('az', '>i2'), ('temp', '>i2'),
+            ('gx', '>i2'), ('gy', '>i2'), ('gz', '>i2'))
+
+# Compressed recording layout:
+#
+#   header   same as a binary recording
+#   blocks   BLOCK_STRUCT (compressed size, samples, first sample, timestamp of
+#            the first sample) followed by that many compressed bytes holding
+#            whole records, each block decompresses on its own
+#   index    one INDEX_STRUCT per block (BLOCK_STRUCT fields plus the offset
+#            of the block) followed by TRAILER_STRUCT
+#
+# The index is written on close. A recording that was cut short has no
+# trailer, its index is rebuilt by walking the block headers.
+BLOCK_STRUCT = struct.Struct('<IIQd')
+INDEX_STRUCT = struct.Struct('<QIIQd')
+TRAILER_STRUCT = struct.Struct('<QI4s8s')
+TRAILER_MAGIC = b'MPZINDEX'
+CODECS = {
+    b'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    b'lzma': (lambda data: lzma.compress(data, preset=1), lzma.decompress),
+}
+
+
+def is_binary(path):
+    return path.endswith(BINARY_EXTENSION)
+
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED_EXTENSION)
+
+
+class Header(object):
+    """Everything needed to interpret the records of a binary recording."""
+
+    def __init__(self, sample_rate, start_time, accel_scale, gyro_scale,
+                 channels=CHANNELS, lost=0, samples=0):
+        self.sample_rate = sample_rate
+        self.start_time = start_time
+        self.accel_scale = accel_scale
+        self.gyro_scale = gyro_scale
+        self.channels = tuple(channels)
+        self.lost = lost
+        self.samples = samples
+
+    @property
+    def record_size(self):
+        return sum(int(dtype[-1]) for _, dtype in self.channels)
+
+    @property
+    def duration(self):
+        return self.samples / float(self.sample_rate)
+
+    def dtype(self):
+        import numpy
+        return numpy.dtype([(str(name), dtype) for name, dtype in self.channels])
+
+    def pack(self):
+        layout = ','.join('{}:{}'.format(name, dtype) for name, dtype in self.channels)
+        fields = HEADER_STRUCT.pack(MAGIC, VERSION, HEADER_SIZE, self.record_size,
+                                    len(self.channels), self.sample_rate, self.start_time,
+                                    self.accel_scale, self.gyro_scale, self.lost, self.samples)
+        data = fields + layout.encode('ascii')
+        if len(data) > HEADER_SIZE:
+            raise ValueError('Channel layout does not fit into the header')
+        return data.ljust(HEADER_SIZE, b'\x00')
+
+    @classmethod
+    def unpack(cls, data):
+        if len(data) < HEADER_STRUCT.size or data[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not an MPU6050 recording')
+        (_, version, header_size, record_size, channel_count, sample_rate, start_time,
+         accel_scale, gyro_scale, lost, samples) = HEADER_STRUCT.unpack_from(data)
+        if version != VERSION or header_size != HEADER_SIZE:
+            raise ValueError('Unsupported recording version {}'.format(version))
+        layout = bytes(data[HEADER_STRUCT.size:header_size]).rstrip(b'\x00').decode('ascii')
+        channels = [tuple(item.split(':')) for item in layout.split(',')]
+        if len(channels) != channel_count:
+            raise ValueError('Corrupt channel layout {!r}'.format(layout))
+        header = cls(sample_rate, start_time, accel_scale, gyro_scale, channels, lost, samples)
+        if header.record_size != record_size:
+            raise ValueError('Corrupt channel layout {!r}'.format(layout))
+        return header
+
+
+def read_header(path):
+    """Read the header of a binary or compressed recording.
+
+    The sample count is taken from the file size or the block index, so
+    recordings that were not closed cleanly are still readable up to their
+    last whole record or block.
+    """
+    if is_compressed(path):
+        return BlockReader(path).header
+    with open(path, 'rb') as f:
+        header = Header.unpack(f.read(HEADER_SIZE))
+        f.seek(0, os.SEEK_END)
+        header.samples = (f.tell() - HEADER_SIZE) // header.record_size
+    return header
+
+
+def open_memmap(path):
+    """Map a binary recording as a read-only numpy structured array.
+
+    Returns (header, records). Nothing is copied: records is a
+    numpy.memmap over the file with one field per channel.
+    """
+    import numpy
+    header = read_header(path)
+    records = numpy.memmap(path, dtype=header.dtype(), mode='r',
+                           offset=HEADER_SIZE, shape=(header.samples,))
+    return header, records
+
+
+class BinaryWriter(object):
+    """Appends raw sensor records to a binary recording."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self._file = open(path, 'wb')
+        self._file.write(header.pack())
+
+    def write(self, data):
+        self._file.write(data)
+        self.header.samples += len(data) // self.header.record_size
+
+    def close(self):
+        # Rewrite the header with the final sample and lost counts
+        try:
+            self._file.seek(0)
+            self._file.write(self.header.pack())
+        finally:
+            self._file.close()
+
+
+class CsvWriter(object):
+    """Converts raw sensor records to CSV rows.
+
+    `clock` maps a sample index to its timestamp, the first record written
+    is sample `first_sample` of the recording.
+    """
+
+    def __init__(self, path, header, clock, first_sample=0):
+        self.path = path
+        self.header = header
+        self.first_sample = first_sample
+        self._clock = clock
+        self._file = open(path, 'w')
+        self._file.write(CSV_HEADER)
+
+    def write(self, data):
+        accel_scale = self.header.accel_scale
+        gyro_scale = self.header.gyro_scale
+        index = self.first_sample + self.header.samples
+        rows = []
+        for raw in sensor.SAMPLE_STRUCT.iter_unpack(data):
+            values = sensor.raw_to_units(raw, accel_scale, gyro_scale)
+            rows.append(CSV_ROW.format(self._clock(index), *values))
+            index += 1
+        self._file.write(''.join(rows))
+        self.header.samples = index - self.first_sample
+
+    def close(self):
+        self._file.close()
+
+
+class BlockEntry(object):
+    """Where one compressed block lives and which samples it holds."""
+
+    def __init__(self, offset, size, samples, first_sample, timestamp):
+        self.offset = offset
+        self.size = size
+        self.samples = samples
+        self.first_sample = first_sample
+        self.timestamp = timestamp
+
+
+class CompressedWriter(object):
+    """Writes raw sensor records as independently compressed blocks.
+
+    Records are collected into blocks of `block_records`, full blocks are
+    compressed and written by a worker thread so a slow codec never holds
+    up the caller. `clock` maps a sample index to its timestamp, the first
+    record written is sample `first_sample` of the recording. An error in
+    the worker, e.g. a full disk, is raised by the next write() or close().
+    """
+
+    def __init__(self, path, header, clock, codec=b'zlib', block_records=1000, first_sample=0):
+        if codec not in CODECS:
+            raise ValueError('codec must be one of {}'.format(sorted(CODECS)))
+        self.path = path
+        self.header = header
+        self.codec = codec
+        self.block_size = block_records * header.record_size
+        self.index = []
+        self.first_sample = first_sample
+        self._clock = clock
+        self._compress = CODECS[codec][0]
+        self._pending = bytearray()
+        self._queued = 0
+        self.error = None
+        self._file = open(path, 'wb')
+        self._file.write(header.pack())
+        self._blocks = queue.Queue(maxsize=64)
+        self._thread = threading.Thread(target=self._compress_loop, name='recording-compressor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        self._pending.extend(data)
+        while len(self._pending) >= self.block_size:
+            self._queue_block(self.block_size)
+
+    def _queue_block(self, size):
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        samples = size // self.header.record_size
+        self._blocks.put((self._queued, self._clock(self.first_sample + self._queued), data))
+        self._queued += samples
+
+    def _compress_loop(self):
+        record_size = self.header.record_size
+        while True:
+            item = self._blocks.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue  # keep taking blocks so the caller never blocks on a full queue
+            try:
+                self._write_block(item, record_size)
+            except Exception as e:
+                self.error = e
+
+    def _write_block(self, item, record_size):
+        first_sample, timestamp, data = item
+        compressed = self._compress(data)
+        samples = len(data) // record_size
+        entry = BlockEntry(self._file.tell(), len(compressed), samples, first_sample, timestamp)
+        self._file.write(BLOCK_STRUCT.pack(entry.size, samples, first_sample, timestamp))
+        self._file.write(compressed)
+        self.index.append(entry)
+        self.header.samples = first_sample + samples
+
+    def close(self):
+        whole = len(self._pending) - len(self._pending) % self.header.record_size
+        if whole:
+            self._queue_block(whole)
+        self._blocks.put(None)
+        self._thread.join()
+        try:
+            if self.error is not None:
+                raise self.error
+            index_offset = self._file.tell()
+            for entry in self.index:
+                self._file.write(INDEX_STRUCT.pack(entry.offset, entry.size, entry.samples,
+                                                   entry.first_sample, entry.timestamp))
+            self._file.write(TRAILER_STRUCT.pack(index_offset, len(self.index), self.codec,
+                                                 TRAILER_MAGIC))
+            self._file.seek(0)
+            self._file.write(self.header.pack())
+        finally:
+            self._file.close()
+
+
+class BlockReader(object):
+    """Random access to a compressed recording through its block index.
+
+    Only the blocks overlapping a requested time range are read and
+    decompressed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.header = Header.unpack(f.read(HEADER_SIZE))
+            self.codec, self.index = self._read_index(f)
+        self._decompress = CODECS[self.codec][1]
+        self._timestamps = [entry.timestamp for entry in self.index]
+        if self.index:
+            last = self.index[-1]
+            self.header.samples = last.first_sample + last.samples
+
+    @staticmethod
+    def _read_index(f):
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end >= HEADER_SIZE + TRAILER_STRUCT.size:
+            f.seek(end - TRAILER_STRUCT.size)
+            index_offset, count, codec, magic = TRAILER_STRUCT.unpack(f.read(TRAILER_STRUCT.size))
+            if magic == TRAILER_MAGIC and codec in CODECS:
+                f.seek(index_offset)
+                data = f.read(count * INDEX_STRUCT.size)
+                return codec, [BlockEntry(*fields) for fields in INDEX_STRUCT.iter_unpack(data)]
+
+        # No trailer, walk the block headers up to the last complete block
+        index = []
+        offset = HEADER_SIZE
+        while offset + BLOCK_STRUCT.size <= end:
+            f.seek(offset)
+            size, samples, first_sample, timestamp = BLOCK_STRUCT.unpack(f.read(BLOCK_STRUCT.size))
+            if offset + BLOCK_STRUCT.size + size > end:
+                break
+            index.append(BlockEntry(offset, size, samples, first_sample, timestamp))
+            offset += BLOCK_STRUCT.size + size
+        codec = b'zlib'
+        if index:
+            f.seek(index[0].offset + BLOCK_STRUCT.size)
+            if f.read(6) == b'\xfd7zXZ\x00':
+                codec = b'lzma'
+        return codec, index
+
+    @property
+    def start_time(self):
+        return self._timestamps[0] if self._timestamps else self.header.start_time
+
+    def blocks(self, start=None, end=None):
+        """Index entries of the blocks holding samples between two timestamps."""
+        first = 0
+        if start is not None:
+            first = max(0, bisect.bisect_right(self._timestamps, start) - 1)
+        last = len(self.index)
+        if end is not None:
+            last = bisect.bisect_right(self._timestamps, end)
+        return self.index[first:last]
+
+    def read_block(self, entry, f=None):
+        """Decompress one block and return its raw records."""
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read_block(entry, f)
+        f.seek(entry.offset + BLOCK_STRUCT.size)
+        return self._decompress(f.read(entry.size))
+
+    def read_range(self, start=None, end=None):
+        """Return (first sample index, raw records) between two timestamps."""
+        entries = self.blocks(start, end)
+        if not entries:
+            return 0, b''
+        record_size = self.header.record_size
+        period = 1.0 / self.header.sample_rate
+        data = bytearray()
+        with open(self.path, 'rb') as f:
+            for entry in entries:
+                data.extend(self.read_block(entry, f))
+        first = entries[0]
+        skip = 0
+        if start is not None and start > first.timestamp:
+            skip = min(first.samples, int((start - first.timestamp) / period + 0.5))
+        last = entries[-1]
+        keep = len(data) // record_size
+        if end is not None:
+            tail = last.samples - min(last.samples, int((end - last.timestamp) / period) + 1)
+            keep -= tail
+        return first.first_sample + skip, bytes(data[skip * record_size:keep * record_size])
+
+    def read_records(self, start=None, end=None):
+        """Like read_range() but returns a numpy structured array."""
+        import numpy
+        _, data = self.read_range(start, end)
+        return numpy.frombuffer(data, dtype=self.header.dtype())
+
+
+def open_writer(path, header, clock, first_sample=0):
+    """Return the writer matching the extension of `path`."""
+    if is_compressed(path):
+        return CompressedWriter(path, header, clock, first_sample=first_sample,
+                                block_records=max(1, int(header.sample_rate)))
+    if is_binary(path):
+        return BinaryWriter(path, header)
+    return CsvWriter(path, header, clock, first_sample)
+
+
+def is_recording(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in RECORDING_PATTERNS)
+
+
+def find_recordings_in(directory):
+    """Return the recordings directly inside `directory`, without recursing."""
+    return [entry.path for entry in os.scandir(directory)
+            if entry.is_file() and is_recording(entry.name)]
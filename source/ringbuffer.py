@@ -0,0 +1,107 @@
+import threading
+
+
+class RingBuffer(object):
+    """Preallocated ring of fixed-size records for one producer and one consumer.
+
+    The producer copies whole records in with put(), the consumer gets
+    memoryviews of the filled region with peek() and releases them with
+    consume(). Nothing is allocated after construction. When the buffer is
+    full incoming records are dropped and counted, the data already queued
+    for the consumer is never overwritten. The producer calls close() when
+    it is done, after which wait() no longer blocks.
+
+    Counters are plain ints so other threads (the UI) can read them without
+    taking the lock:
+
+        high_water  most records ever waiting at once
+        overruns    put() calls that could not store all their records
+        dropped     records lost to overruns
+    """
+
+    def __init__(self, capacity, record_size):
+        self.capacity = capacity
+        self.record_size = record_size
+        self._buffer = bytearray(capacity * record_size)
+        self._view = memoryview(self._buffer)
+        self._head = 0  # records ever put
+        self._tail = 0  # records ever consumed
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self.closed = False
+        self.high_water = 0
+        self.overruns = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._head - self._tail
+
+    @property
+    def fill(self):
+        """Fraction of the buffer currently in use."""
+        return len(self) / float(self.capacity)
+
+    @property
+    def total(self):
+        """Records ever stored."""
+        return self._head
+
+    def put(self, data):
+        """Copy whole records from a bytes-like object in, return how many fit."""
+        count = len(data) // self.record_size
+        free = self.capacity - (self._head - self._tail)
+        if count > free:
+            self.overruns += 1
+            self.dropped += count - free
+            count = free
+        if count == 0:
+            return 0
+
+        size = self.record_size
+        start = self._head % self.capacity
+        first = min(count, self.capacity - start)
+        self._view[start * size:(start + first) * size] = memoryview(data)[:first * size]
+        if first < count:
+            self._view[:(count - first) * size] = memoryview(data)[first * size:count * size]
+
+        with self._lock:
+            self._head += count
+            used = self._head - self._tail
+            if used > self.high_water:
+                self.high_water = used
+            self._not_empty.notify()
+        return count
+
+    def wait(self, timeout=None):
+        """Block until records are available, the buffer is closed or
+        `timeout` passes."""
+        with self._lock:
+            if self._head == self._tail and not self.closed:
+                self._not_empty.wait(timeout)
+            return self._head - self._tail
+
+    def peek(self, limit=None):
+        """Return memoryviews (at most two) over the records waiting."""
+        count = self._head - self._tail
+        if limit is not None:
+            count = min(count, limit)
+        if count == 0:
+            return []
+        size = self.record_size
+        start = self._tail % self.capacity
+        first = min(count, self.capacity - start)
+        views = [self._view[start * size:(start + first) * size]]
+        if first < count:
+            views.append(self._view[:(count - first) * size])
+        return views
+
+    def consume(self, count):
+        """Release `count` records previously returned by peek()."""
+        with self._lock:
+            self._tail += count
+
+    def close(self):
+        """No more records will be put: wake up the consumer for good."""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
@@ -0,0 +1,292 @@
+import math
+import random
+import struct
+import time
+
+try:
+    from smbus import SMBus
+except ImportError:
+    try:
+        from smbus2 import SMBus
+    except ImportError:
+        SMBus = None
+
+try:
+    from smbus2 import i2c_msg
+except ImportError:
+    i2c_msg = None
+
+# I2C address (AD0 low)
+MPU6050_ADDRESS = 0x68
+
+# Register addresses
+SMPLRT_DIV = 0x19
+CONFIG = 0x1A
+GYRO_CONFIG = 0x1B
+ACCEL_CONFIG = 0x1C
+FIFO_EN = 0x23
+INT_ENABLE = 0x38
+INT_STATUS = 0x3A
+ACCEL_XOUT_H = 0x3B
+USER_CTRL = 0x6A
+PWR_MGMT_1 = 0x6B
+FIFO_COUNTH = 0x72
+FIFO_R_W = 0x74
+WHO_AM_I = 0x75
+
+WHO_AM_I_VALUE = 0x68
+
+# FIFO_EN bits: temperature, gyro x/y/z and accel in the ACCEL_XOUT_H layout
+FIFO_EN_ALL = 0x80 | 0x40 | 0x20 | 0x10 | 0x08
+# USER_CTRL bits
+USER_CTRL_FIFO_EN = 0x40
+USER_CTRL_FIFO_RESET = 0x04
+# INT_STATUS / INT_ENABLE bits
+INT_FIFO_OFLOW = 0x10
+
+FIFO_SIZE = 1024
+# SMBus block transfers are limited to 32 bytes
+SMBUS_BLOCK_MAX = 32
+
+# Full scale ranges, register value -> LSB per unit
+ACCEL_SCALES = {0x00: 16384.0, 0x08: 8192.0, 0x10: 4096.0, 0x18: 2048.0}   # LSB/g
+GYRO_SCALES = {0x00: 131.0, 0x08: 65.5, 0x10: 32.8, 0x18: 16.4}            # LSB/(deg/s)
+
+# One burst of ACCEL_XOUT_H..GYRO_ZOUT_L: ax ay az temp gx gy gz
+SAMPLE_SIZE = 14
+SAMPLE_STRUCT = struct.Struct('>7h')
+
+# Gyro output rate with the digital low pass filter enabled
+BASE_RATE = 1000
+
+
+def raw_to_units(raw, accel_scale=ACCEL_SCALES[0x00], gyro_scale=GYRO_SCALES[0x00]):
+    """Convert a raw (ax, ay, az, temp, gx, gy, gz) tuple to g, deg C and deg/s."""
+    ax, ay, az, temp, gx, gy, gz = raw
+    return (ax / accel_scale, ay / accel_scale, az / accel_scale,
+            temp / 340.0 + 36.53,
+            gx / gyro_scale, gy / gyro_scale, gz / gyro_scale)
+
+
+class MPU6050(object):
+    """MPU6050 accelerometer/gyroscope driven directly over SMBus."""
+
+    def __init__(self, bus=None, address=MPU6050_ADDRESS, port=1):
+        if bus is None:
+            if SMBus is None:
+                raise ImportError('smbus or smbus2 is required to talk to the MPU6050')
+            bus = SMBus(port)
+        self.bus = bus
+        self.address = address
+        self.rate = BASE_RATE
+        self.accel_range = 0x00
+        self.gyro_range = 0x00
+
+    @property
+    def accel_scale(self):
+        return ACCEL_SCALES[self.accel_range]
+
+    @property
+    def gyro_scale(self):
+        return GYRO_SCALES[self.gyro_range]
+
+    def probe(self):
+        """Return True if an MPU6050 answers on the bus."""
+        try:
+            return self.bus.read_byte_data(self.address, WHO_AM_I) == WHO_AM_I_VALUE
+        except (IOError, OSError):
+            return False
+
+    def configure(self, rate=100, accel_range=0x00, gyro_range=0x00):
+        """Wake the sensor up and set sample rate and full scale ranges.
+
+        The rate is rounded to the nearest divider of the 1 kHz gyro output
+        rate, the rate actually configured is returned.
+        """
+        divider = max(0, min(255, int(round(BASE_RATE / float(rate))) - 1))
+        self.bus.write_byte_data(self.address, PWR_MGMT_1, 0x01)  # PLL with X gyro reference
+        self.bus.write_byte_data(self.address, CONFIG, 0x01)      # DLPF 188 Hz, 1 kHz output
+        self.bus.write_byte_data(self.address, SMPLRT_DIV, divider)
+        self.bus.write_byte_data(self.address, ACCEL_CONFIG, accel_range)
+        self.bus.write_byte_data(self.address, GYRO_CONFIG, gyro_range)
+        self.accel_range = accel_range
+        self.gyro_range = gyro_range
+        self.rate = BASE_RATE / float(divider + 1)
+        return self.rate
+
+    def read_bytes(self):
+        """Read one sample in the 14 byte big-endian register layout."""
+        return bytearray(self.bus.read_i2c_block_data(self.address, ACCEL_XOUT_H, SAMPLE_SIZE))
+
+    def read_raw(self):
+        """Read one sample as a raw (ax, ay, az, temp, gx, gy, gz) tuple."""
+        return SAMPLE_STRUCT.unpack(bytes(self.read_bytes()))
+
+    def read(self):
+        """Read one sample converted to g, deg C and deg/s."""
+        return raw_to_units(self.read_raw(), self.accel_scale, self.gyro_scale)
+
+    # FIFO
+
+    def enable_fifo(self):
+        """Route accel, temperature and gyro samples into the 1 kB FIFO."""
+        self.bus.write_byte_data(self.address, FIFO_EN, 0x00)
+        self.bus.write_byte_data(self.address, INT_ENABLE, INT_FIFO_OFLOW)
+        self.reset_fifo()
+        self.bus.write_byte_data(self.address, FIFO_EN, FIFO_EN_ALL)
+
+    def stop_fifo_capture(self):
+        """Stop feeding the FIFO, what is already queued can still be read."""
+        self.bus.write_byte_data(self.address, FIFO_EN, 0x00)
+
+    def disable_fifo(self):
+        self.stop_fifo_capture()
+        self.bus.write_byte_data(self.address, USER_CTRL, 0x00)
+
+    def reset_fifo(self):
+        """Drop the FIFO contents and clear a pending overflow."""
+        self.bus.write_byte_data(self.address, USER_CTRL, USER_CTRL_FIFO_RESET)
+        self.bus.write_byte_data(self.address, USER_CTRL, USER_CTRL_FIFO_EN)
+        self.bus.read_byte_data(self.address, INT_STATUS)
+
+    def fifo_overflowed(self):
+        """Return True if the FIFO overflowed since the last call."""
+        return bool(self.bus.read_byte_data(self.address, INT_STATUS) & INT_FIFO_OFLOW)
+
+    def fifo_count(self):
+        """Number of bytes waiting in the FIFO."""
+        high, low = self.bus.read_i2c_block_data(self.address, FIFO_COUNTH, 2)
+        return (high << 8) | low
+
+    def read_fifo(self, length):
+        """Read `length` bytes from the FIFO.
+
+        smbus2 can do it in one combined write/read transaction; plain smbus
+        falls back to as few 32 byte block reads as possible.
+        """
+        if i2c_msg is not None and hasattr(self.bus, 'i2c_rdwr'):
+            write = i2c_msg.write(self.address, [FIFO_R_W])
+            read = i2c_msg.read(self.address, length)
+            self.bus.i2c_rdwr(write, read)
+            return bytes(bytearray(list(read)))
+        data = bytearray()
+        while len(data) < length:
+            chunk = min(SMBUS_BLOCK_MAX, length - len(data))
+            data.extend(self.bus.read_i2c_block_data(self.address, FIFO_R_W, chunk))
+        return bytes(data)
+
+
+class SimulatedBus(object):
+    """Stand-in for SMBus that emulates an MPU6050 shaking at `frequency` Hz.
+
+    Every transaction costs `latency` seconds, roughly what one transfer
+    takes on the Pi's 400 kHz I2C bus, so benchmarks stay meaningful. The
+    FIFO fills in real time at the configured sample rate and overflows like
+    the real one; `produced` and `dropped` count every sample it generated.
+    """
+
+    def __init__(self, frequency=5.0, amplitude=0.5, latency=0.0, address=MPU6050_ADDRESS):
+        self.address = address
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.latency = latency
+        self.registers = bytearray(128)
+        self.registers[WHO_AM_I] = WHO_AM_I_VALUE
+        self.transactions = 0
+        self.produced = 0
+        self.dropped = 0
+        self._fifo = bytearray()
+        self._start = time.time()
+        self._fifo_time = None
+
+    def _transaction(self, address):
+        if address != self.address:
+            raise IOError(121, 'Remote I/O error')
+        self.transactions += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self._fill_fifo(time.time())
+
+    @property
+    def sample_rate(self):
+        return BASE_RATE / float(self.registers[SMPLRT_DIV] + 1)
+
+    def _fifo_enabled(self):
+        return (self.registers[USER_CTRL] & USER_CTRL_FIFO_EN and
+                self.registers[FIFO_EN] == FIFO_EN_ALL)
+
+    def _fill_fifo(self, now):
+        if not self._fifo_enabled():
+            self._fifo_time = None
+            return
+        if self._fifo_time is None:
+            self._fifo_time = now
+            return
+        period = 1.0 / self.sample_rate
+        while self._fifo_time + period <= now:
+            self._fifo_time += period
+            self.produced += 1
+            if len(self._fifo) + SAMPLE_SIZE > FIFO_SIZE:
+                self.dropped += 1
+                self.registers[INT_STATUS] |= INT_FIFO_OFLOW
+            else:
+                self._fifo.extend(SAMPLE_STRUCT.pack(*self._sample(self._fifo_time)))
+
+    def _sample(self, t):
+        phase = 2 * math.pi * self.frequency * (t - self._start)
+        accel = self.amplitude * math.sin(phase)
+        gyro = 10.0 * math.cos(phase)
+        a_scale = ACCEL_SCALES[self.registers[ACCEL_CONFIG]]
+        g_scale = GYRO_SCALES[self.registers[GYRO_CONFIG]]
+
+        def clamp(value):
+            return max(-32768, min(32767, int(value + random.gauss(0, 4))))
+        return (clamp(accel * a_scale), clamp(0), clamp(a_scale),
+                clamp((25.0 - 36.53) * 340),
+                clamp(gyro * g_scale), clamp(0), clamp(0))
+
+    def read_byte_data(self, address, register):
+        self._transaction(address)
+        value = self.registers[register]
+        if register == INT_STATUS:
+            self.registers[INT_STATUS] = 0
+        elif register == FIFO_COUNTH:
+            value = len(self._fifo) >> 8
+        elif register == FIFO_COUNTH + 1:
+            value = len(self._fifo) & 0xFF
+        elif register == FIFO_R_W:
+            value = self._pop_fifo(1)[0]
+        return value
+
+    def write_byte_data(self, address, register, value):
+        self._transaction(address)
+        if register == USER_CTRL and value & USER_CTRL_FIFO_RESET:
+            del self._fifo[:]
+            self._fifo_time = None
+            value &= ~USER_CTRL_FIFO_RESET
+        self.registers[register] = value & 0xFF
+
+    def read_i2c_block_data(self, address, register, length=32):
+        self._transaction(address)
+        length = min(length, SMBUS_BLOCK_MAX)
+        if register == FIFO_R_W:
+            return list(self._pop_fifo(length))
+        if register == FIFO_COUNTH:
+            return [len(self._fifo) >> 8, len(self._fifo) & 0xFF][:length]
+        if register == ACCEL_XOUT_H:
+            self.registers[ACCEL_XOUT_H:ACCEL_XOUT_H + SAMPLE_SIZE] = \
+                SAMPLE_STRUCT.pack(*self._sample(time.time()))
+        return list(self.registers[register:register + length])
+
+    def _pop_fifo(self, length):
+        data = self._fifo[:length]
+        del self._fifo[:length]
+        # Reading past the end of the FIFO returns garbage on the chip, pad with zeros
+        return data + bytearray(length - len(data))
+
+
+def open_sensor(simulated=False):
+    """Return an unconfigured MPU6050 on the Pi's I2C bus, or on a SimulatedBus."""
+    if simulated:
+        return MPU6050(SimulatedBus())
+    return MPU6050()
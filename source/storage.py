@@ -0,0 +1,127 @@
+import collections
+import os
+import threading
+
+import acquisition
+import catalog
+import recording
+
+# Keep at least this much free space on the recordings filesystem
+RESERVE_BYTES = 256 * 1024 * 1024
+CHECK_INTERVAL = 2.0
+
+
+def free_bytes(path):
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+class StorageManager(object):
+    """Deletes the oldest recordings when free space drops below a reserve.
+
+    Completed recordings, and the finished segments of the recording in
+    progress, are kept in an OrderedDict from oldest to newest: the next
+    one to evict is always at the front, nothing is rescanned. They are
+    taken from the catalog once, when the manager is created, or from a
+    listing of the directory if there is no catalog. Only recordings named
+    by the recorder directly in `directory` are ever evicted. Evicted files
+    are removed from the catalog.
+    """
+
+    def __init__(self, directory=acquisition.RECORD_DIR, reserve=RESERVE_BYTES,
+                 interval=CHECK_INTERVAL, catalog=None):
+        self.directory = directory
+        self.catalog = catalog
+        self.reserve = reserve
+        self.interval = interval
+        self.evicted = []
+        self.error = None
+        self._files = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._seed()
+
+    def _seed(self):
+        if self.catalog is not None:
+            for entry in self.catalog.recordings(complete_only=True):
+                if catalog.is_recorded_file(entry.path, self.directory):
+                    self._files[entry.path] = None
+            return
+        entries = [(os.path.getmtime(path), path)
+                   for path in recording.find_recordings_in(self.directory)
+                   if catalog.is_recorded_file(path, self.directory)]
+        for _, path in sorted(entries):
+            self._files[path] = None
+
+    def add(self, path):
+        """Register a recording or segment that was just closed."""
+        with self._lock:
+            self._files.pop(path, None)
+            self._files[path] = None
+
+    def discard(self, path):
+        """Forget a recording that was deleted by someone else."""
+        with self._lock:
+            self._files.pop(path, None)
+
+    def oldest(self):
+        with self._lock:
+            return next(iter(self._files), None)
+
+    def __len__(self):
+        return len(self._files)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='storage-manager')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.enforce()
+            except OSError as e:
+                self.error = e
+            self._stop.wait(self.interval)
+
+    def enforce(self):
+        """Evict oldest files until the reserve is free, return what was deleted."""
+        deleted = []
+        while free_bytes(self.directory) < self.reserve:
+            with self._lock:
+                if not self._files:
+                    break
+                path, _ = self._files.popitem(last=False)
+            if not catalog.is_recorded_file(path, self.directory):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            finally:
+                if self.catalog is not None:
+                    self.catalog.remove(path)
+            deleted.append(path)
+            print('STORAGE LOW, DELETED {}'.format(path))
+        self.evicted.extend(deleted)
+        return deleted
+
+
+_manager = None
+
+
+def get_manager():
+    """The storage manager shared by every recording of this session."""
+    global _manager
+    if _manager is None:
+        _manager = StorageManager(catalog=catalog.get_catalog())
+    return _manager
@@ -1,27 +1,21 @@
 from time import sleep
-from os.path import expanduser
-import myLCD, cutie
-import subprocess, os, fnmatch
+import myLCD, cutie, catalog
+import subprocess, os
 
 
 def delete_file():
 	myLCD.clear_all()
 
-	# find all *.csv files and display select
-	home = expanduser('~')
-	csv_files = find_all_files('*.csv', home)
+	# list all recordings from the catalog and display select
+	index = catalog.get_catalog()
+	index.refresh()
+	recordings = index.recordings()
+	csv_files = [r.path for r in recordings]
 
 	if len(csv_files) == 0:
 		myLCD.updateLCD(str2='NO FILES FOUND')
 
-	csv_files_lcd = [] 
-	count = 1
-	for file in csv_files:
-		strs = file.split('_')
-		tmp = str(count)+'. '+strs[1]+' '+strs[2]
-		#tmp = tmp[:tmp.rfind(':')]
-		csv_files_lcd.append(tmp)
-		count += 1
+	csv_files_lcd = [r.label(i + 1) for i, r in enumerate(recordings)]
 
 	#transfer selected file to usb
 	myLCD.clear_all()
@@ -32,9 +26,13 @@ def delete_file():
 
 	print('SELECTED CSV: '+ selected_csv)
 
-	myLCD.updateLCD(str2='SELECTED CSV: ', str3=selected_csv.split('Device')[1][2:], str4='DELETING FILE')
+	myLCD.updateLCD(str2='SELECTED CSV: ', str3=os.path.basename(selected_csv), str4='DELETING FILE')
 
-	os.remove(selected_csv)
+	try:
+		os.remove(selected_csv)
+	except FileNotFoundError:
+		pass
+	index.remove(selected_csv)
 	sleep(1)
 
 	myLCD.updateLCD(str4='FILE DELETED')
@@ -42,14 +40,6 @@ def delete_file():
 
 	return
 
-def find_all_files(pattern, path):
-    result = []
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            if fnmatch.fnmatch(name, pattern):
-                result.append(os.path.join(root, name))
-    return result
-
 def _set_time_helper(time_tuple):
 	cmd = 'sudo date --set=\'{}-{}-{}\''.format(time_tuple[0], time_tuple[1], time_tuple[2])
 	subprocess.check_output(cmd.split())
@@ -0,0 +1,726 @@
+import collections
+import csv
+import errno
+import functools
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import parts
+
+# Bytes handed to the kernel per copy call
+CHUNK_SIZE = 8 * 1024 * 1024
+# Seconds between progress callbacks
+PROGRESS_INTERVAL = 0.5
+# Bytes between fsynced restart points of a resumable copy
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+
+# Errors meaning "this copy primitive does not work for these two files"
+UNSUPPORTED = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF)
+
+SHA256 = 'sha256'
+CRC32 = 'crc32'
+# Written next to the exported recordings on the stick
+MANIFEST_NAME = 'manifest.csv'
+# Files still being copied have offset < size and the checksum of the
+# first offset bytes; offset == size means copied and verified. A recording
+# split into parts has one entry per part, added once all are verified.
+MANIFEST_FIELDS = ['name', 'size', 'mtime', 'algorithm', 'checksum', 'offset']
+
+COPY_FILE_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+READ_WRITE = 'read/write'
+
+
+def usb_file_name(path):
+    """Name for a recording on the FAT formatted stick, which can't hold ':'.
+
+    mpu6050_2024-01-02_10:11:12.mpz becomes mpu6050_2024-01-02_10h11m12s.mpz
+    """
+    name, extension = os.path.splitext(os.path.basename(path).replace(' ', ''))
+    if name.count(':') == 2:
+        name = name.replace(':', 'h', 1).replace(':', 'm', 1) + 's'
+    return name.replace(':', '-') + extension
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class VerificationError(IOError):
+    """The file on the stick does not match the recording it was copied from."""
+
+
+class Cancelled(Exception):
+    """The transfer was stopped by the user."""
+
+
+def _check(cancel):
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+
+
+class Crc32(object):
+    """zlib.crc32 behind the hashlib update()/hexdigest() interface."""
+
+    name = CRC32
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def copy(self):
+        return Crc32(self.value)
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return '{:08x}'.format(self.value & 0xffffffff)
+
+
+def new_checksum(algorithm):
+    if algorithm == CRC32:
+        return Crc32()
+    if algorithm == SHA256:
+        return hashlib.sha256()
+    raise ValueError('unknown checksum {!r}'.format(algorithm))
+
+
+class Progress(object):
+    """Bytes copied so far, with throughput and time left derived from them."""
+
+    def __init__(self, total, done=0, action='COPIED'):
+        self.total = total
+        self.done = done
+        self.initial = done
+        self.action = action
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+        self.method = None
+        self.checksum = None
+
+    def update(self, done):
+        self.done = done
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Bytes per second, counting only what was moved by this run."""
+        return (self.done - self.initial) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current rate, None until there is a rate."""
+        if self.rate == 0:
+            return None
+        return (self.total - self.done) / self.rate
+
+    def lines(self):
+        """Text for LCD lines 2 to 4."""
+        eta = self.eta
+        return ('{} {:.1f} OF {:.1f} MB'.format(self.action, self.done / 1e6, self.total / 1e6),
+                '{:.1f} MB/S'.format(self.rate / 1e6),
+                'ETA {}'.format('--' if eta is None else format_duration(eta)))
+
+
+def _copy_file_range(src, dst, count):
+    return os.copy_file_range(src.fileno(), dst.fileno(), count)
+
+
+def _sendfile(src, dst, count):
+    return os.sendfile(dst.fileno(), src.fileno(), None, count)
+
+
+def _read_write(src, dst, count, buf, checksum=None):
+    n = src.readinto(buf[:count])
+    if checksum is not None and n:
+        checksum.update(buf[:n])
+    written = 0
+    while written < n:
+        written += dst.write(buf[written:n])
+    return n
+
+
+def copy_file(source, destination, progress=None, chunk_size=CHUNK_SIZE,
+              interval=PROGRESS_INTERVAL, checksum=None, offset=0, hasher=None,
+              checkpoint=None, checkpoint_bytes=CHECKPOINT_BYTES, cancel=None):
+    """Copy `source` to `destination` inside this process, return a Progress.
+
+    The data goes through copy_file_range() or sendfile() so it never
+    passes through Python; the first that works for the two files is used
+    and plain reads and writes are the last resort. `progress` is called
+    with the Progress at most every `interval` seconds and once at the end.
+    The destination is fsynced once, after the last byte.
+
+    With a `checksum` algorithm the data is read into Python once, hashed
+    and written from the same buffer, and the digest is left in the
+    Progress's `checksum`.
+
+    A non-zero `offset` resumes a previous copy: the destination is cut
+    back to `offset` bytes and copying continues from there. `hasher` is
+    the checksum of the source up to `offset` if the caller already has
+    it, otherwise that part of the source is hashed again. `checkpoint`,
+    if given, is called as checkpoint(offset, checksum) every
+    `checkpoint_bytes` after the destination has been fsynced up to offset.
+
+    Setting the `cancel` event stops the copy with Cancelled between two
+    chunks; what was written stays, the caller decides what to keep.
+    """
+    total = os.path.getsize(source)
+    state = Progress(total, done=offset)
+    if checksum and hasher is None:
+        hasher = new_checksum(checksum)
+        if offset:
+            checksum_file(source, checksum, length=offset, hasher=hasher, cancel=cancel)
+    methods = []
+    if hasher is None and hasattr(os, 'copy_file_range'):
+        methods.append((COPY_FILE_RANGE, _copy_file_range))
+    if hasher is None and hasattr(os, 'sendfile'):
+        methods.append((SENDFILE, _sendfile))
+    buf = memoryview(bytearray(min(chunk_size, max(total, 1))))
+    methods.append((READ_WRITE, functools.partial(_read_write, buf=buf, checksum=hasher)))
+
+    fd = os.open(destination, os.O_WRONLY | os.O_CREAT | (0 if offset else os.O_TRUNC), 0o666)
+    with open(source, 'rb', buffering=0) as src, open(fd, 'wb', buffering=0) as dst:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if offset:
+            dst.truncate(offset)
+            dst.seek(offset)
+            src.seek(offset)
+        done = offset
+        last_report = state.started
+        next_checkpoint = offset + checkpoint_bytes
+        while done < total:
+            _check(cancel)
+            name, method = methods[0]
+            try:
+                n = method(src, dst, min(chunk_size, total - done))
+            except OSError as e:
+                if e.errno not in UNSUPPORTED or len(methods) == 1 or done > offset:
+                    raise
+                methods.pop(0)
+                continue
+            if n == 0:
+                break  # source shrank underneath us
+            done += n
+            state.method = name
+            if checkpoint is not None and done >= next_checkpoint and done < total:
+                os.fsync(dst.fileno())
+                checkpoint(done, hasher.hexdigest() if hasher is not None else None)
+                next_checkpoint = done + checkpoint_bytes
+            if progress is not None and time.monotonic() - last_report >= interval:
+                state.update(done)
+                progress(state)
+                last_report = time.monotonic()
+        os.fsync(dst.fileno())
+
+    state.update(done)
+    if hasher is not None:
+        state.checksum = hasher.hexdigest()
+    if progress is not None:
+        progress(state)
+    return state
+
+
+def drop_cache(path):
+    """Ask the kernel to forget the cached pages of `path` so the next read hits the device."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def checksum_file(path, algorithm, progress=None, chunk_size=CHUNK_SIZE,
+                  interval=PROGRESS_INTERVAL, length=None, hasher=None, cancel=None):
+    """Read `path` once and return a Progress with its checksum.
+
+    Only the first `length` bytes are read if given. `hasher` is fed
+    instead of a new checksum object so the caller can carry on with it.
+    """
+    size = os.path.getsize(path)
+    state = Progress(size if length is None else min(length, size), action='VERIFIED')
+    hasher = hasher or new_checksum(algorithm)
+    buf = memoryview(bytearray(chunk_size))
+    done = 0
+    last_report = state.started
+    with open(path, 'rb', buffering=0) as f:
+        while done < state.total:
+            _check(cancel)
+            n = f.readinto(buf[:min(chunk_size, state.total - done)])
+            if not n:
+                break
+            hasher.update(buf[:n])
+            done += n
+            if progress is not None and time.monotonic() - last_report >= interval:
+                state.update(done)
+                progress(state)
+                last_report = time.monotonic()
+    state.update(done)
+    state.checksum = hasher.hexdigest()
+    if progress is not None:
+        progress(state)
+    return state
+
+
+class ManifestEntry(collections.namedtuple('ManifestEntry', MANIFEST_FIELDS)):
+    """One file on the stick: its source's size and mtime, and how far it got."""
+
+    __slots__ = ()
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    def matches(self, size, mtime):
+        """True if this entry was made from a source of that size and mtime."""
+        return self.size == size and (self.mtime is None or self.mtime == mtime)
+
+
+def read_manifest(directory):
+    """Entries of the manifest in `directory` by file name, empty if there is none."""
+    entries = collections.OrderedDict()
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    size = int(row['size'])
+                    # manifests written before resuming existed have no mtime or offset
+                    mtime = float(row['mtime']) if row.get('mtime') else None
+                    offset = int(row['offset']) if row.get('offset') else size
+                    entry = ManifestEntry(row['name'], size, mtime, row['algorithm'],
+                                          row['checksum'], offset)
+                except (KeyError, TypeError, ValueError):
+                    continue  # damaged line, the file will be copied again
+                entries[entry.name] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def write_manifest(directory, entries):
+    """Replace the manifest in `directory`, never leaving a half written one."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(MANIFEST_FIELDS)
+        for entry in entries.values():
+            writer.writerow(['' if value is None else repr(value) if isinstance(value, float)
+                             else value for value in entry])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _resume_point(source, destination, entry, algorithm):
+    """Offset and source hasher to resume a partial copy from, or (0, None)."""
+    st = os.stat(source)
+    if (entry is None or entry.complete or entry.algorithm != algorithm
+            or not entry.matches(st.st_size, st.st_mtime)):
+        return 0, None
+    try:
+        if os.path.getsize(destination) < entry.offset:
+            return 0, None
+    except OSError:
+        return 0, None
+    hasher = new_checksum(algorithm)
+    prefix = checksum_file(source, algorithm, length=entry.offset, hasher=hasher)
+    if prefix.checksum != entry.checksum:
+        return 0, None
+    return entry.offset, hasher
+
+
+def exported(entries, directory, name, size, mtime):
+    """True if the manifest shows the recording complete on the stick, whole or in parts."""
+    entry = entries.get(name)
+    if entry is not None and entry.complete and entry.matches(size, mtime):
+        path = os.path.join(directory, name)
+        return os.path.exists(path) and os.path.getsize(path) == size
+    first = entries.get(parts.part_name(name, 1))
+    return (first is not None and first.complete and first.mtime == mtime
+            and os.path.exists(os.path.join(directory, first.name)))
+
+
+class _PartFile(object):
+    """One part of a split export, hashed as it is written."""
+
+    def __init__(self, path, algorithm):
+        self.path = path
+        self.size = 0
+        self.checksum = None
+        self._hasher = new_checksum(algorithm)
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        self._hasher.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.checksum = self._hasher.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def export_split(source, directory, name=None, algorithm=SHA256, progress=None,
+                 uncached=True, entries=None, max_part=parts.FAT_MAX_FILE,
+                 interval=PROGRESS_INTERVAL, cancel=None):
+    """Export a recording too large for one file as numbered parts.
+
+    The recording is read once, front to back, and cut on record
+    boundaries by parts.split(); each part is hashed as it is written and
+    read back afterwards like a plain export. Parts are not resumed, an
+    interrupted split export starts over. Returns the copy and
+    verification Progress objects, the first with `parts` set.
+
+    If anything goes wrong, cancelling included, every part written so
+    far is removed again.
+    """
+    name = name or usb_file_name(source)
+    if entries is None:
+        entries = read_manifest(directory)
+    st = os.stat(source)
+    copied = Progress(st.st_size)
+    copied.method = 'split'
+    written = []
+    last_report = [copied.started]
+
+    # parts of an earlier export of this recording are about to be overwritten
+    prefix = os.path.splitext(name)[0] + '_part'
+    stale = [n for n in entries if n.startswith(prefix)]
+    if stale:
+        for n in stale:
+            entries.pop(n)
+        write_manifest(directory, entries)
+
+    def new_part(number):
+        written.append(_PartFile(os.path.join(directory, parts.part_name(name, number)),
+                                 algorithm))
+        return written[-1]
+
+    def source_progress(done):
+        _check(cancel)
+        if progress is not None and time.monotonic() - last_report[0] >= interval:
+            copied.update(done)
+            progress(copied)
+            last_report[0] = time.monotonic()
+
+    try:
+        copied.parts = parts.split(source, max_part, new_part, source_progress)
+        copied.update(st.st_size)
+        if progress is not None:
+            progress(copied)
+
+        verified = Progress(sum(part.size for part in written), action='VERIFIED')
+        base = 0
+        for part in written:
+            if uncached:
+                drop_cache(part.path)
+
+            def part_progress(state, base=base):
+                verified.update(base + state.done)
+                if progress is not None:
+                    progress(verified)
+
+            check = checksum_file(part.path, algorithm, progress=part_progress, cancel=cancel)
+            if check.checksum != part.checksum:
+                raise VerificationError('{} does not match what was written ({} {} != {})'.format(
+                    part.path, algorithm, check.checksum, part.checksum))
+            base += part.size
+        verified.update(base)
+    except BaseException:
+        for part in written:
+            part.discard()
+        raise
+
+    for part in written:
+        part_name = os.path.basename(part.path)
+        entries[part_name] = ManifestEntry(part_name, part.size, st.st_mtime, algorithm,
+                                           part.checksum, part.size)
+    write_manifest(directory, entries)
+    return copied, verified
+
+
+def _cut_back(path, entry):
+    """Truncate an interrupted copy to its restart point, or remove it."""
+    if entry is not None and not entry.complete and entry.offset:
+        with open(path, 'r+b') as f:
+            f.truncate(entry.offset)
+            os.fsync(f.fileno())
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def export_file(source, directory, name=None, algorithm=SHA256, progress=None,
+                uncached=True, entries=None, resume=True, max_part=None, cancel=None):
+    """Copy a recording into `directory`, verify it and record it in the manifest.
+
+    The source is read once: its checksum is computed while copying. Only
+    the copy is read back, after dropping it from the page cache when
+    `uncached` so the bytes really come from the stick. Returns the copy
+    and verification Progress objects, so the two times can be reported
+    separately. Raises VerificationError if the checksums differ.
+
+    Restart points are written to the manifest while copying; with
+    `resume` a copy that was interrupted carries on from the last one.
+    `entries` is the manifest already read by the caller, it is updated
+    in place. A recording larger than `max_part` is handed to
+    export_split().
+
+    When cancelled the copy is cut back to its last restart point, or
+    removed if there is none, so the stick and its manifest agree.
+    """
+    name = name or usb_file_name(source)
+    destination = os.path.join(directory, name)
+    if entries is None:
+        entries = read_manifest(directory)
+    st = os.stat(source)
+    if max_part is not None and st.st_size > max_part:
+        return export_split(source, directory, name, algorithm, progress, uncached, entries,
+                            max_part, cancel=cancel)
+    offset, hasher = 0, None
+    if resume:
+        offset, hasher = _resume_point(source, destination, entries.get(name), algorithm)
+    if not offset and name in entries:
+        # the old entry no longer describes the file about to be written
+        entries.pop(name)
+        write_manifest(directory, entries)
+
+    def checkpoint(done, checksum):
+        entries[name] = ManifestEntry(name, st.st_size, st.st_mtime, algorithm, checksum, done)
+        write_manifest(directory, entries)
+
+    try:
+        copied = copy_file(source, destination, progress=progress, checksum=algorithm,
+                           offset=offset, hasher=hasher, checkpoint=checkpoint, cancel=cancel)
+        if uncached:
+            drop_cache(destination)
+        verified = checksum_file(destination, algorithm, progress=progress, cancel=cancel)
+    except Cancelled:
+        _cut_back(destination, entries.get(name))
+        raise
+    if verified.checksum != copied.checksum or verified.done != copied.done:
+        entries.pop(name, None)
+        write_manifest(directory, entries)
+        raise VerificationError('{} does not match {} ({} {} != {})'.format(
+            destination, source, algorithm, verified.checksum, copied.checksum))
+
+    entries[name] = ManifestEntry(name, copied.done, st.st_mtime, algorithm, copied.checksum,
+                                  copied.done)
+    write_manifest(directory, entries)
+    return copied, verified
+
+
+class SyncProgress(Progress):
+    """Progress over every byte a sync copies and reads back."""
+
+    def __init__(self, total, files):
+        Progress.__init__(self, total, action='SYNCED')
+        self.files = files
+        self.index = 0
+        self.name = ''
+        self.phase = 'COPY'
+
+    def lines(self):
+        eta = self.eta
+        return ('SYNC {}/{} {} {}'.format(self.index, self.files, self.phase, self.name),
+                '{:.1f} OF {:.1f} MB {:.1f} MB/S'.format(self.done / 1e6, self.total / 1e6,
+                                                        self.rate / 1e6),
+                'ETA {}'.format('--' if eta is None else format_duration(eta)))
+
+
+class SyncResult(object):
+
+    def __init__(self):
+        self.copied = []
+        self.resumed = []
+        self.skipped = []
+        self.failed = []
+        self.bytes = 0
+        self.copy_time = 0.0
+        self.verify_time = 0.0
+        self.cancelled = False
+
+
+def sync_all(sources, directory, algorithm=SHA256, progress=None, uncached=True,
+             max_part=None, cancel=None):
+    """Bring `directory` up to date with every recording in `sources`.
+
+    Files the manifest lists as complete with the same size and mtime are
+    skipped, interrupted copies are resumed, everything else is copied and
+    verified. Recordings over `max_part` bytes are split. One file failing
+    does not stop the others; cancelling stops the sync after cutting the
+    current file back to its last restart point.
+    """
+    entries = read_manifest(directory)
+    result = SyncResult()
+    todo = []
+    total = 0
+    for source in sources:
+        name = usb_file_name(source)
+        st = os.stat(source)
+        entry = entries.get(name)
+        if exported(entries, directory, name, st.st_size, st.st_mtime):
+            result.skipped.append(source)
+            continue
+        todo.append((source, name))
+        # copy and read back, less what a resume will not copy again
+        total += 2 * st.st_size - (entry.offset if entry is not None and not entry.complete else 0)
+
+    overall = SyncProgress(total, len(todo))
+    # bytes done by the files before this one, and copied of this one
+    current = {'base': 0, 'copied': 0}
+
+    def file_progress(state):
+        if state.action == 'VERIFIED':
+            overall.phase = 'VERIFY'
+            overall.update(current['base'] + current['copied'] + state.done)
+        else:
+            overall.phase = 'COPY'
+            current['copied'] = state.done - state.initial
+            overall.update(current['base'] + current['copied'])
+        if progress is not None:
+            progress(overall)
+
+    for index, (source, name) in enumerate(todo):
+        overall.index = index + 1
+        overall.name = name
+        try:
+            copied, verified = export_file(source, directory, name, algorithm, file_progress,
+                                           uncached, entries, max_part=max_part, cancel=cancel)
+        except Cancelled:
+            result.cancelled = True
+            break
+        except (OSError, ValueError) as e:
+            print('SYNC FAILED FOR {}: {}'.format(source, e))
+            result.failed.append(source)
+            continue
+        finally:
+            current['base'] = overall.done
+            current['copied'] = 0
+        (result.resumed if copied.initial else result.copied).append(source)
+        result.bytes += copied.done - copied.initial
+        result.copy_time += copied.elapsed
+        result.verify_time += verified.elapsed
+    return result
+
+
+class Job(threading.Thread):
+    """Runs an export or sync in the background so the menu stays responsive.
+
+    `target` is called with the given arguments plus `progress` and
+    `cancel`; the UI reads the latest Progress from `progress` whenever it
+    redraws and stops the job with cancel(). Once the thread has ended,
+    `result` holds what the target returned, or `error` what it raised.
+    """
+
+    def __init__(self, target, *args, **kwargs):
+        threading.Thread.__init__(self, name='usb-transfer')
+        self.daemon = True
+        self._target_function = target
+        self._args = args
+        self._kwargs = kwargs
+        self.cancel_event = threading.Event()
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.report = None  # set by the caller: draws the result when done
+        self.reported = False
+
+    def _report(self, state):
+        self.progress = state
+
+    def run(self):
+        try:
+            self.result = self._target_function(*self._args, progress=self._report,
+                                                cancel=self.cancel_event, **self._kwargs)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def running(self):
+        return self.is_alive()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set() or getattr(self.result, 'cancelled', False)
+
+
+_job = None
+
+
+def start_job(target, *args, **kwargs):
+    """Start `target` as the background transfer; only one runs at a time."""
+    global _job
+    if busy():
+        raise RuntimeError('A USB transfer is already running')
+    _job = Job(target, *args, **kwargs)
+    _job.start()
+    return _job
+
+
+def current_job():
+    """The running transfer, or the last one if its result was not shown yet."""
+    if _job is not None and (_job.running or not _job.reported):
+        return _job
+    return None
+
+
+def busy():
+    return _job is not None and _job.running
+
+
+def benchmark(directory=None, size=256 * 1024 * 1024):
+    """Copy a scratch file into `directory` (e.g. a tmpfs) and print MB/s."""
+    directory = directory or tempfile.gettempdir()
+    fd, source = tempfile.mkstemp(dir=directory, suffix='.src')
+    with os.fdopen(fd, 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size // len(block)):
+            f.write(block)
+    destination = source[:-len('.src')] + '.dst'
+    try:
+        state = copy_file(source, destination)
+        print('{}: {:.1f} MB in {:.2f} s, {:.1f} MB/s via {}'.format(
+            directory, state.done / 1e6, state.elapsed, state.rate / 1e6, state.method))
+        os.remove(destination)
+        for algorithm in (CRC32, SHA256):
+            copied, verified = export_file(source, directory, os.path.basename(destination),
+                                           algorithm=algorithm)
+            print('{} {}: copy {:.2f} s ({:.1f} MB/s), verify {:.2f} s ({:.1f} MB/s)'.format(
+                directory, algorithm, copied.elapsed, copied.rate / 1e6,
+                verified.elapsed, verified.rate / 1e6))
+            os.remove(destination)
+    finally:
+        os.remove(source)
+        for path in (destination, os.path.join(directory, MANIFEST_NAME)):
+            if os.path.exists(path):
+                os.remove(path)
+    return state
+
+
+if __name__ == '__main__':
+    benchmark(*sys.argv[1:2])
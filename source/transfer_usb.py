@@ -1,19 +1,35 @@
 import csv
 import cutie
-import os, fnmatch
-from glob import glob
+import os
 import subprocess
-from os.path import expanduser
 import shutil
 from time import sleep
 import myLCD
+import catalog
+import transfer
+import compression
+import devices
+import usbkey
+import planner
+
+USB_MOUNT = '/media/usb/'
+SYNC_ALL = 'SYNC ALL'
+EXPORT_OPTIONS = ['AUTO (FASTEST)', 'PLAIN COPY', 'GZIP (.GZ)']
+EXPORT_METHODS = [None, compression.PLAIN, compression.GZIP]
 
 def transfer_usb():
 
 	myLCD.clear_all()
 
+	# a transfer left running in the background: show it again instead of starting another
+	job = transfer.current_job()
+	if job is not None:
+		watch_job(job)
+		return
+
 	#find usb and confirm hash
-	usb = get_usb_devices()
+	tracker = devices.get_tracker()
+	usb = tracker.usb_partitions()
 
 	while len(usb) == 0:
 		myLCD.printLine(1, 'NO USB CONNECTED')
@@ -23,19 +39,33 @@ def transfer_usb():
 		selected_option = cutie.select(options, selected_index=0)
 		if selected_option == -1:
 			return	# back to main menu
-		usb = get_usb_devices()
+		usb = tracker.usb_partitions()
 
 
 	# mount usb device if necessary
-	usb_mount_pt = get_mount_points()
+	usb_mount_pt = tracker.usb_mounts()
 	if len(usb_mount_pt) == 0:
 		# mount should iterate through all file system types in /proc/filesystems but fails itermittently
-	    bash_mount_cmd = 'sudo mount /dev/{}1 /media/usb/'.format(usb.keys()[0])
-	    print(bash_mount_cmd)
-	    subprocess.check_output(bash_mount_cmd.split())
-
-	sleep(1)
-	hashfile = find_file('hash.key', '/media/usb/')
+		bash_mount_cmd = 'sudo mount {} {}'.format(usb[0].node, USB_MOUNT)
+		print(bash_mount_cmd)
+		subprocess.check_output(bash_mount_cmd.split())
+		tracker.refresh()
+		usb_mount_pt = tracker.usb_mounts()
+		if len(usb_mount_pt) == 0:
+			myLCD.printLine(1, 'USB MOUNT FAILED')
+			sleep(1)
+			return
+	usb_dir = usb_mount_pt[0][1]
+
+	usb_device = tracker.device_at(usb_dir)
+	fstype = usb_device.fstype if usb_device else None
+	authorized = usbkey.load_authorized()
+	if authorized is None:
+		print('NO AUTHORIZED KEYS: {}'.format(usbkey.AUTHORIZED_KEYS))
+		myLCD.printLine(1, 'NO AUTHORIZED KEYS')
+		sleep(1)
+		return # back to main menu
+	hashfile = usbkey.authorize(usb_dir, usb_device.uuid if usb_device else None, authorized)
 
 	if hashfile is None:
 		print('INVALID USB')
@@ -43,84 +73,161 @@ def transfer_usb():
 		sleep(1)
 		return # back to main menu
 
-	# find all *.csv files and display select
-	home = expanduser('~')
-	csv_files = find_all_files('*.csv', home)
+	# list all recordings from the catalog and display select
+	index = catalog.get_catalog()
+	index.refresh()
+	recordings = index.recordings(complete_only=True)
+	csv_files = [r.path for r in recordings]
 
-	csv_files_lcd = [] 
-	count = 1
-	for file in csv_files:
-		strs = file.split('_')
-		tmp = str(count)+'. '+strs[1]+' '+strs[2]
-		#tmp = tmp[:tmp.rfind(':')]
-		csv_files_lcd.append(tmp)
-		count += 1
+	csv_files_lcd = [SYNC_ALL] + [r.label(i + 1) for i, r in enumerate(recordings)]
 
 	#transfer selected file to usb
 	myLCD.clear_all()
 	selected_index = cutie.select(csv_files_lcd, selected_index=0)
 	if selected_index == -1:
 		return
-	selected_csv = csv_files[selected_index]
+	if not usb_writable(usb_dir):
+		return
+	if selected_index == 0:
+		sync_all(recordings, usb_dir, fstype)
+		return
+	selected_csv = csv_files[selected_index - 1]
 
 	print('SELECTED CSV: '+ selected_csv)
 
-	myLCD.updateLCD(str2='SELECTED CSV: '+ selected_csv, str3='COPYING FILE', str4='DO NOT UNPLUG USB')
-	#shutil.copy(selected_csv, '/media/usb'+selected_csv)
-
-	# hacky workaround using bash executed in python 
-	cmd = 'sudo chmod 777 /media/usb/'
-	subprocess.check_output(cmd.split())
-
-	selected_csv_file = selected_csv.split('/')[-1]
-	selected_csv_file = selected_csv_file.replace(' ', '')
-	indexColon = selected_csv_file.find(':')
-	selected_csv_file = selected_csv_file[:indexColon]+'h'+selected_csv_file[indexColon+1]
-	indexColon = selected_csv_file.find(':')
-	selected_csv_file = selected_csv_file[:indexColon]+'m'+selected_csv_file[indexColon+1]
-	indexSecAbrv = selected_csv_file.find('.csv')
-	selected_csv_file = selected_csv_file[:indexSecAbrv]+'s'+selected_csv_file[indexSecAbrv:]
-
-	cmd = 'sudo touch /media/usb/{}'.format(selected_csv_file)
-	#subprocess.check_output(cmd.split())
+	myLCD.clear_all()
+	myLCD.printLine(1, 'SELECT EXPORT FORMAT:')
+	selected_export = cutie.select(EXPORT_OPTIONS, selected_index=0)
+	if selected_export == -1:
+		return
+	method = EXPORT_METHODS[selected_export]
+
+	# check the stick has room before writing anything
+	plan = planner.plan_export([recordings[selected_index - 1]], usb_dir, method, fstype)
+	print('PLAN: ' + plan.summary())
+	if not plan.ok:
+		myLCD.updateLCD(str2='TRANSFER REFUSED', str3=plan.summary(),
+			str4='{:.1f} MB FREE ON USB'.format(plan.free / 1e6))
+		sleep(2)
+		return
+	if plan.replanned:
+		myLCD.updateLCD(str2='NOT ENOUGH SPACE FOR A PLAIN COPY', str3='EXPORTING AS GZIP')
+		sleep(1)
+	method = plan.files[0].method
+	if plan.files[0].parts > 1:
+		# too large for one file on this stick, split it as a plain copy
+		method = compression.PLAIN
+		myLCD.updateLCD(str2='FILE OVER 4 GB', str3='SPLITTING INTO {} PARTS'.format(plan.files[0].parts))
+		sleep(1)
+	myLCD.updateLCD(str2='COPYING '+ os.path.basename(selected_csv),
+		str3='MEASURING USB SPEED' if method is None else '', str4='DO NOT UNPLUG USB')
 
-	cmd = 'sudo cp {} /media/usb/{}'.format(selected_csv, selected_csv_file)
-	cmd = cmd.split()
-	cmd = cmd[:2] + [cmd[2]+' '+cmd[3]] + cmd[4:]
-	subprocess.check_output(cmd)
+	job = transfer.start_job(compression.export, selected_csv, usb_dir, method, max_part=plan.max_file)
+	job.report = show_export_result
+	watch_job(job)
+	return
 
-	sleep(1)
+def watch_job(job):
+	# redraw the clock and progress until the transfer ends, red cancels it,
+	# green goes back to the menu and leaves it running
+	while job.running:
+		if job.cancel_event.is_set():
+			myLCD.updateLCD(str2='CANCELLING...', str4='DO NOT UNPLUG USB')
+		elif job.progress is not None:
+			myLCD.updateLCD(*job.progress.lines())
+		else:
+			myLCD.getTime()
+		button = cutie.wait_for_button()
+		if button == 'red':
+			print('CANCELLING TRANSFER')
+			job.cancel()
+		elif button == 'green' and not job.cancel_event.is_set():
+			myLCD.updateLCD(str2='TRANSFER CONTINUES IN BACKGROUND',
+				str3='OPEN TRANSFER DATA TO SEE PROGRESS')
+			sleep(1)
+			return
+	job.join()
+	job.reported = True
+	job.report(job)
+
+def show_export_result(job):
+	if job.cancelled:
+		print('TRANSFER CANCELLED')
+		myLCD.updateLCD(str2='TRANSFER CANCELLED', str3='PARTIAL FILE ROLLED BACK')
+		sleep(2)
+		return
+	if isinstance(job.error, transfer.VerificationError):
+		print('VERIFY FAILED: {}'.format(job.error))
+		myLCD.updateLCD(str2='VERIFY FAILED', str3='FILE ON USB IS CORRUPT', str4='TRY ANOTHER USB')
+		sleep(2)
+		return
+	if job.error is not None:
+		print('COPY FAILED: {}'.format(job.error))
+		myLCD.updateLCD(str2='COPY FAILED', str3=str(job.error))
+		sleep(2)
+		return
+	method, copied, verified = job.result
+	print('EXPORTED {} BYTES ({}) IN {:.1f} S ({:.1f} MB/S), VERIFIED IN {:.1f} S'.format(
+		copied.done, method, copied.elapsed, copied.rate / 1e6, verified.elapsed))
 
 	#done
-	myLCD.updateLCD(str2='TRANSFER COMPLETE')
+	myLCD.updateLCD(str2='TRANSFER COMPLETE, CHECKSUM OK', str3='{:.1f} MB {} IN {} ({:.1f} MB/S)'.format(
+		copied.done / 1e6, method.upper(), transfer.format_duration(copied.elapsed), copied.rate / 1e6),
+		str4='VERIFIED IN {}'.format(transfer.format_duration(verified.elapsed)))
 	print('DONE')
 	sleep(1)
-	return
 
-def get_usb_devices():
-    sdb_devices = map(os.path.realpath, glob('/sys/block/sd*'))
-    usb_devices = (dev for dev in sdb_devices
-        if 'usb' in dev.split('/')[5])
-    return dict((os.path.basename(dev), dev) for dev in usb_devices)
-
-
-def get_mount_points(devices=None):
-    devices = devices or get_usb_devices() # if devices are None: get_usb_devices
-    output = subprocess.check_output(['mount']).splitlines()
-    is_usb = lambda path: any(dev in path for dev in devices)
-    usb_info = (line for line in output if is_usb(line.split()[0]))
-    return [(info.split()[0], info.split()[2]) for info in usb_info]
-
-
-def find_file(name, path):
-    for root, dirs, files in os.walk(path):
-        if name in files:
-            return os.path.join(root, name)
-
-def find_all_files(pattern, path):
-    result = []
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            if fnmatch.fnmatch(name, pattern):
-                result.append(os.path.join(root, name))
-    return result
+def usb_writable(usb_dir):
+	if os.access(usb_dir, os.W_OK):
+		return True
+	try:
+		os.chmod(usb_dir, 0o777)
+		return True
+	except OSError as e:
+		print(e)
+		myLCD.updateLCD(str2='USB NOT WRITABLE')
+		sleep(1)
+		return False
+
+def sync_all(recordings, usb_dir, fstype=None):
+	# copy everything the manifest on the stick does not have yet, as far as it fits
+	plan = planner.plan_export(recordings, usb_dir, compression.PLAIN, fstype,
+		transfer.read_manifest(usb_dir), replan=False)
+	print('PLAN: {} TO COPY, {} UP TO DATE, {} REFUSED, {}'.format(
+		len(plan.files), len(plan.up_to_date), len(plan.refused), plan.summary()))
+	if plan.refused:
+		myLCD.updateLCD(str2='{} RECORDINGS DO NOT FIT'.format(len(plan.refused)), str3=plan.summary(),
+			str4='SYNCING THE OTHER {}'.format(len(plan.files)) if plan.files else '')
+		sleep(2)
+		if not plan.files:
+			return
+	csv_files = plan.up_to_date + [f.path for f in plan.files]
+	myLCD.updateLCD(str2='SYNCING {} RECORDINGS'.format(len(plan.files)), str4='DO NOT UNPLUG USB')
+
+	job = transfer.start_job(transfer.sync_all, csv_files, usb_dir, max_part=plan.max_file)
+	job.report = show_sync_result
+	watch_job(job)
+
+def show_sync_result(job):
+	if job.error is not None:
+		print('SYNC FAILED: {}'.format(job.error))
+		myLCD.updateLCD(str2='SYNC FAILED', str3=str(job.error))
+		sleep(2)
+		return
+	result = job.result
+	print('SYNC: {} COPIED, {} RESUMED, {} UP TO DATE, {} FAILED, {} BYTES, COPY {:.1f} S, VERIFY {:.1f} S'.format(
+		len(result.copied), len(result.resumed), len(result.skipped), len(result.failed),
+		result.bytes, result.copy_time, result.verify_time))
+
+	if result.cancelled:
+		title = 'SYNC CANCELLED, RESUMES NEXT TIME'
+	elif result.failed:
+		title = 'SYNC FAILED FOR {} FILES'.format(len(result.failed))
+	else:
+		title = 'SYNC COMPLETE'
+	myLCD.updateLCD(str2=title,
+		str3='{} COPIED {} UP TO DATE'.format(len(result.copied) + len(result.resumed), len(result.skipped)),
+		str4='COPY {} VERIFY {}'.format(transfer.format_duration(result.copy_time),
+			transfer.format_duration(result.verify_time)))
+	print('DONE')
+	sleep(2)
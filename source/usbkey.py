@@ -0,0 +1,161 @@
+import hashlib
+import os
+import sys
+
+KEY_NAME = 'hash.key'
+# Where field sticks keep the key, relative to the mount point, checked first
+KEY_LOCATIONS = ['', 'key', 'keys', '.key']
+# Fallback search: at most this many directories deep and entries looked at
+MAX_DEPTH = 2
+MAX_ENTRIES = 2000
+# SHA-256 digests of accepted key files, one per line, '#' starts a comment.
+# Without it no stick is accepted; add keys with `python3 usbkey.py enroll`
+AUTHORIZED_KEYS = '/home/pi/accelerometer_raspi/authorized_keys'
+# A key file larger than this is not a key
+MAX_KEY_SIZE = 64 * 1024
+
+# filesystem UUID -> key path, for sticks already authorised this session
+_authorized = {}
+
+
+def find_key(mount_point, name=KEY_NAME, locations=KEY_LOCATIONS, max_depth=MAX_DEPTH,
+             max_entries=MAX_ENTRIES):
+    """Path of the key file on the stick, or None.
+
+    The usual locations are tried first, then a breadth-first scandir
+    search that stops after `max_depth` directory levels or `max_entries`
+    entries, so a full stick can't stall the menu.
+    """
+    for location in locations:
+        path = os.path.join(mount_point, location, name)
+        if os.path.isfile(path):
+            return path
+
+    seen = 0
+    level = [mount_point]
+    for _ in range(max_depth + 1):
+        following = []
+        for directory in level:
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    seen += 1
+                    if seen > max_entries:
+                        return None
+                    if entry.name == name and entry.is_file():
+                        return entry.path
+                    if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                        following.append(entry.path)
+        level = following
+    return None
+
+
+def load_authorized(path=None):
+    """Accepted key digests, or None if no list is installed on this device."""
+    path = path or AUTHORIZED_KEYS
+    try:
+        with open(path) as f:
+            return set(line.strip().lower() for line in f
+                       if line.strip() and not line.startswith('#'))
+    except (IOError, OSError):
+        return None
+
+
+def key_digest(path):
+    with open(path, 'rb') as f:
+        data = f.read(MAX_KEY_SIZE + 1)
+    if len(data) > MAX_KEY_SIZE or not data.strip():
+        return None
+    return hashlib.sha256(data.strip()).hexdigest()
+
+
+def verify_key(path, authorized=None):
+    """True if the key's SHA-256 is in `authorized`.
+
+    Without a list of authorised keys no key is accepted.
+    """
+    try:
+        digest = key_digest(path)
+    except (IOError, OSError):
+        return False
+    if digest is None:
+        return False
+    if authorized is None:
+        authorized = load_authorized()
+    if authorized is None:
+        print('NO {}, REJECTING {}'.format(AUTHORIZED_KEYS, path))
+        return False
+    return digest in authorized
+
+
+def authorize(mount_point, uuid=None, authorized=None):
+    """Key path if the stick at `mount_point` carries a valid key, else None.
+
+    Sticks that passed are remembered by filesystem UUID for the rest of
+    the session and not searched again.
+    """
+    if uuid is not None and uuid in _authorized:
+        return _authorized[uuid]
+    path = find_key(mount_point)
+    if path is None or not verify_key(path, authorized):
+        return None
+    if uuid is not None:
+        _authorized[uuid] = path
+    return path
+
+
+def forget(uuid=None):
+    """Drop the remembered result for one stick, or for all of them."""
+    if uuid is None:
+        _authorized.clear()
+    else:
+        _authorized.pop(uuid, None)
+
+
+def enroll(key, path=None):
+    """Add the digest of an existing key file to the authorised list.
+
+    `key` is the key file itself or a mount point to find it on. The list
+    is created if it does not exist. Returns the digest.
+    """
+    path = path or AUTHORIZED_KEYS
+    if os.path.isdir(key):
+        found = find_key(key)
+        if found is None:
+            raise IOError('No {} on {}'.format(KEY_NAME, key))
+        key = found
+    digest = key_digest(key)
+    if digest is None:
+        raise ValueError('{} is empty or larger than {} bytes'.format(key, MAX_KEY_SIZE))
+    authorized = load_authorized(path)
+    if authorized is None or digest not in authorized:
+        with open(path, 'a') as f:
+            if authorized is None:
+                f.write('# SHA-256 of accepted {} files\n'.format(KEY_NAME))
+            f.write(digest + '\n')
+    return digest
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Manage the USB sticks accepted for transfers')
+    commands = parser.add_subparsers(dest='command')
+    add = commands.add_parser('enroll', help='accept the {} of a stick'.format(KEY_NAME))
+    add.add_argument('key', help='the key file, or the mount point of the stick carrying it')
+    add.add_argument('--list', default=AUTHORIZED_KEYS,
+                     help='authorised key list (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if args.command != 'enroll':
+        parser.error('nothing to do, see enroll --help')
+    try:
+        digest = enroll(args.key, args.list)
+    except (IOError, OSError, ValueError) as e:
+        parser.exit(1, '{}\n'.format(e))
+    print('{} ENROLLED IN {}'.format(digest, args.list))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
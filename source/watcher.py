@@ -0,0 +1,156 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+
+import recording
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+EVENT = struct.Struct('iIII')
+
+RECORDING_EVENTS = (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE |
+                    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return _libc
+
+
+class Inotify(object):
+    """Minimal inotify(7) binding through ctypes, no extra package needed.
+
+    Raises OSError where inotify is not available.
+    """
+
+    def __init__(self):
+        try:
+            libc = _load_libc()
+            init = libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._libc = libc
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self):
+        """Return the pending events as (wd, mask, cookie, name) tuples."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class CatalogWatcher(object):
+    """Keeps a catalog in step with one recordings directory.
+
+    New recordings are registered as incomplete when they are created and
+    read in full when the writer closes them, so a file the Java tool is
+    still writing is not offered for transfer. Moves and deletions update
+    the catalog immediately. If the kernel queue overflows the directory is
+    reconciled once instead.
+    """
+
+    def __init__(self, catalog, directory):
+        self.catalog = catalog
+        self.directory = directory
+        self.events = 0
+        self.error = None
+        self._inotify = Inotify()
+        try:
+            self._inotify.add_watch(directory, RECORDING_EVENTS)
+        except OSError:
+            self._inotify.close()
+            raise
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='catalog-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        os.write(self._stop_w, b'x')
+        if self._thread is not None:
+            self._thread.join()
+        self._inotify.close()
+        os.close(self._stop_r)
+        os.close(self._stop_w)
+
+    def _run(self):
+        try:
+            while True:
+                ready, _, _ = select.select([self._inotify.fd, self._stop_r], [], [])
+                if self._stop_r in ready:
+                    return
+                for _, mask, _, name in self._inotify.read():
+                    self.events += 1
+                    if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        return
+                    if mask & IN_Q_OVERFLOW:
+                        self.catalog.reconcile(self.directory)
+                    elif not mask & IN_ISDIR and recording.is_recording(name):
+                        self.handle(mask, os.path.join(self.directory, name))
+        except Exception as e:
+            self.error = e
+
+    def handle(self, mask, path):
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self.catalog.remove(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.catalog.add_file(path, closed=True)
+        elif mask & IN_CREATE and self.catalog.get(path) is None:
+            self.catalog.add_partial(path)